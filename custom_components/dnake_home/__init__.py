@@ -1,67 +1,287 @@
 import logging
 from datetime import timedelta
+from homeassistant.components import webhook
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
+from homeassistant.const import CONF_WEBHOOK_ID, Platform
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_interval
 
-from .core.assistant import assistant
-from .cover import load_covers, update_covers_state
-from .light import load_lights, update_lights_state
-from .climate import load_climates, update_climates_state
-from .floor_heating import load_floor_heatings, update_floor_heatings_state
-from .air_fresh import load_air_fresh_devices, update_air_fresh_state
+from .core.assistant import Assistant
+from .core.constant import (
+    DOMAIN,
+    CONF_CHANNELS,
+    CONF_COMMAND_QUEUE,
+    CONF_COMMAND_TTL,
+    CONF_COVER_POLL_INTERVAL,
+    CONF_GW_IOT_NAME,
+    CONF_MAX_INFLIGHT,
+    CONF_POLL_TIERS,
+    CONF_PUSH_ENABLED,
+    CONF_PUSH_RECONCILE_INTERVAL,
+    CONF_RECORD_TRAFFIC,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SCAN_INTERVAL,
+    CONF_SCOPED_IDS,
+    CONF_TEMP_DEADBAND,
+    CONF_TEMP_MIN_INTERVAL,
+    DEFAULT_COVER_POLL_INTERVAL,
+    DEFAULT_MAX_INFLIGHT,
+    DEFAULT_PUSH_RECONCILE_INTERVAL,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_SCAN_INTERVAL,
+    TRAFFIC_RECORDING_FILE,
+)
+from .core.channels import ChannelFilter
+from .core.command_queue import CommandQueue, DEFAULT_COMMAND_TTL
+from .core.model import GatewayModel
+from .core.recorder import TrafficRecorder
+from .poller import DnakePoller
+from .hub import GatewayHub, find_hub, loaded_hubs
+from .device_sync import DeviceSync
+from .push import async_setup_push, async_unload_push
+from .services import async_setup_services, async_unload_services
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.LIGHT, Platform.COVER, Platform.CLIMATE, Platform.FAN]
+PLATFORMS = [
+    Platform.LIGHT,
+    Platform.COVER,
+    Platform.CLIMATE,
+    Platform.FAN,
+    Platform.SENSOR,
+]
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
+def get_option(entry: ConfigEntry, key, default=None):
+    """Options flow values win over the ones entered at setup"""
+    return entry.options.get(key, entry.data.get(key, default))
+
+
+# gateway_ip -> 最近加载的设备模型，重载时复用
+_models = {}
+
+
+def _configure_transport(entry: ConfigEntry, assistant: Assistant):
+    assistant.configure(
+        timeout=get_option(entry, CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT),
+        max_inflight=get_option(entry, CONF_MAX_INFLIGHT, DEFAULT_MAX_INFLIGHT),
+    )
+    if get_option(entry, CONF_COMMAND_QUEUE, False):
+        if assistant.command_queue is None:
+            assistant.set_command_queue(CommandQueue())
+        assistant.command_queue.ttl = get_option(
+            entry, CONF_COMMAND_TTL, DEFAULT_COMMAND_TTL
+        )
+    else:
+        assistant.set_command_queue(None)
+
+
+def _apply_options(entry: ConfigEntry, hub: GatewayHub):
+    """Apply the gateway-level options of ``entry``, the hub's owning entry"""
+    _configure_transport(entry, hub.assistant)
+    settings = hub.temperature_filter
+    settings.deadband = get_option(entry, CONF_TEMP_DEADBAND, settings.deadband)
+    settings.min_interval = get_option(
+        entry, CONF_TEMP_MIN_INTERVAL, settings.min_interval
+    )
+    hub.cover_poll_interval = timedelta(
+        milliseconds=get_option(
+            entry, CONF_COVER_POLL_INTERVAL, DEFAULT_COVER_POLL_INTERVAL
+        )
+    )
+    if hub.poller:
+        hub.poller.configure(
+            scan_interval=get_option(entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+            tiers=get_option(entry, CONF_POLL_TIERS),
+            reconcile_interval=get_option(
+                entry, CONF_PUSH_RECONCILE_INTERVAL, DEFAULT_PUSH_RECONCILE_INTERVAL
+            ),
+        )
+
+
+def _async_apply_push(hass: HomeAssistant, entry: ConfigEntry, poller: DnakePoller):
+    if not get_option(entry, CONF_PUSH_ENABLED, False):
+        async_unload_push(hass, entry.entry_id)
+        return
+    webhook_id = entry.data.get(CONF_WEBHOOK_ID)
+    if webhook_id is None:
+        # 首次开启时生成，之后保持不变，外部推送方无需重新配置
+        webhook_id = webhook.async_generate_id()
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_WEBHOOK_ID: webhook_id}
+        )
+    async_setup_push(hass, entry.entry_id, webhook_id, poller)
+
+
+def _entry_namespace(entry: ConfigEntry):
+    """Prefix of the unique ids of the entry's gateway, empty for plain ids"""
+    if not entry.data.get(CONF_SCOPED_IDS):
+        return ""
+    return entry.data.get(CONF_GW_IOT_NAME) or entry.data["gateway_ip"]
+
+
+async def _async_apply_recorder(
+    hass: HomeAssistant, entry: ConfigEntry, assistant: Assistant
+):
+    enabled = get_option(entry, CONF_RECORD_TRAFFIC, False)
+    if enabled and assistant.recorder is None:
+        name = TRAFFIC_RECORDING_FILE
+        namespace = _entry_namespace(entry)
+        if namespace:
+            # 每个网关各自录制到一个文件
+            name = name.replace(".ndjson", f"_{namespace}.ndjson")
+        path = hass.config.path(name)
+        recorder = await hass.async_add_executor_job(TrafficRecorder, path)
+        assistant.set_recorder(recorder)
+        _LOGGER.warning("recording gateway traffic to %s", path)
+    elif not enabled and assistant.recorder is not None:
+        await hass.async_add_executor_job(assistant.set_recorder, None)
+
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    # 直接作用于运行中的轮询与网关连接，不重载集成
+    hub = hass.data[DOMAIN].get(entry.entry_id)
+    if hub is None:
+        return
+    if hub.owner == entry.entry_id:
+        _apply_options(entry, hub)
+        await _async_apply_recorder(hass, entry, hub.assistant)
+    else:
+        # 网关级选项只认一个条目，避免各条目的选项互相覆盖
+        _LOGGER.warning(
+            "gateway %s settings follow entry %s; only the push options of %s apply",
+            hub.key,
+            hub.owner,
+            entry.title,
+        )
+    if hub.poller:
+        _async_apply_push(hass, entry, hub.poller)
+
+
+async def _async_load_model(hass: HomeAssistant, assistant: Assistant, identity):
+    """Reuse the in-memory model if it belongs to the same gateway login"""
+    model = _models.get(identity[0])
+    if model and model.identity == identity:
+        _LOGGER.info("reuse loaded device model: %d devices", len(model.device_list))
+        return model
+    iot_info = await hass.async_add_executor_job(assistant.query_iot_info)
+    if not iot_info:
+        _LOGGER.error("query_iot_info fail")
+        return None
+    assistant.bind_iot_info(iot_info.get("iot_device_name"), iot_info.get("gw_iot_name"))
+    device_list = await hass.async_add_executor_job(assistant.query_device_list)
+    if not device_list:
+        _LOGGER.error("query_device_list fail")
+        return None
+    model = _models[identity[0]] = GatewayModel(identity, iot_info, device_list)
+    return model
+
+
+async def _async_setup_hub(hass: HomeAssistant, entry: ConfigEntry):
     gateway_ip = entry.data["gateway_ip"]
     auth_username = entry.data["auth_username"]
     auth_password = entry.data["auth_password"]
+    # 每个网关一个连接（会话、限流器与命令队列）
+    assistant = Assistant()
     assistant.bind_auth_info(gateway_ip, auth_username, auth_password)
-    iot_info = await hass.async_add_executor_job(assistant.query_iot_info)
-    if iot_info:
-        iot_device_name = iot_info.get("iot_device_name")
-        gw_iot_name = iot_info.get("gw_iot_name")
-        assistant.bind_iot_info(iot_device_name, gw_iot_name)
-        device_list = await hass.async_add_executor_job(assistant.query_device_list)
-        if device_list:
-            # 设备分类
-            load_lights(device_list)
-            load_covers(device_list)
-            load_climates(device_list)
-            load_floor_heatings(device_list)
-            load_air_fresh_devices(device_list)
-            # 初始化各类设备
-            await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-
-            async def _async_refresh_states(now=None):
-                _LOGGER.info("update all device state")
-                states = await hass.async_add_executor_job(assistant.read_all_dev_state)
-                update_lights_state(states)
-                update_covers_state(states)
-                update_climates_state(states)
-                update_floor_heatings_state(states)
-                update_air_fresh_state(states)
-
-            # 初始化设备状态
-            await _async_refresh_states()
-
-            _LOGGER.error(f"assistantlightlight: {assistant.entries["light"]}")
-            # 定时刷新设备状态
-            time_delta = timedelta(seconds=entry.data["scan_interval"])
-            async_track_time_interval(hass, _async_refresh_states, time_delta)
-            return True
-        else:
-            _LOGGER.error("query_device_list fail")
+    _configure_transport(entry, assistant)
+    await _async_apply_recorder(hass, entry, assistant)
+    model = await _async_load_model(
+        hass, assistant, (gateway_ip, auth_username, auth_password)
+    )
+    if not model:
+        await hass.async_add_executor_job(assistant.close)
+        await hass.async_add_executor_job(assistant.set_recorder, None)
+        return None
+    iot_info = model.iot_info
+    assistant.bind_iot_info(iot_info.get("iot_device_name"), iot_info.get("gw_iot_name"))
+    hub = GatewayHub(
+        hass,
+        iot_info.get("gw_iot_name"),
+        gateway_ip,
+        model,
+        assistant,
+        _entry_namespace(entry),
+    )
+    _apply_options(entry, hub)
+    hub.register()
+    return hub
+
+
+def _find_entry_hub(entry: ConfigEntry):
+    return find_hub(entry.data.get(CONF_GW_IOT_NAME), entry.data["gateway_ip"])
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
+    try:
+        channels = ChannelFilter(entry.data.get(CONF_CHANNELS, ""))
+    except ValueError as e:
+        _LOGGER.error("invalid channel filter: %s", e)
+        return False
+    # 同一网关的多个条目共享连接、模型与轮询，各自只订阅自己的通道
+    hub = _find_entry_hub(entry)
+    if hub is None:
+        hub = await _async_setup_hub(hass, entry)
+        if hub is None:
             return False
     else:
-        _LOGGER.error("query_iot_info fail")
-        return False
+        _LOGGER.info("entry shares the running poller of gateway %s", hub.key)
+
+    hub.subscribe(entry.entry_id, channels)
+    # 平台通过 entry_id 找到所属网关
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = hub
+    # 初始化各类设备
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    if hub.poller is None:
+        poller = DnakePoller(
+            hass,
+            hub,
+            get_option(entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+            get_option(entry, CONF_POLL_TIERS),
+            get_option(
+                entry, CONF_PUSH_RECONCILE_INTERVAL, DEFAULT_PUSH_RECONCILE_INTERVAL
+            ),
+        )
+        # 初始化设备状态：重载时沿用上次的状态，由下一轮轮询校准
+        if not await poller.async_restore_cached_states():
+            await poller.async_refresh()
+        # 定时分级刷新设备状态；低频校验设备列表，增删设备无需重启
+        hub.start(poller, DeviceSync(hass, hub))
+    else:
+        # 新订阅的实体先用网关已知的状态初始化
+        await hub.poller.async_restore_cached_states()
+
+    # 可选的推送入口，外部桥接程序可直接上报状态
+    _async_apply_push(hass, entry, hub.poller)
+    async_setup_services(hass)
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+    return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    async_unload_push(hass, entry.entry_id)
+    hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    hub = _find_entry_hub(entry)
+    owned = hub is not None and hub.owner == entry.entry_id
+    released = hub.unsubscribe(entry.entry_id) if hub else None
+    last = hub is None or hub.idle
+    if hub and last:
+        hub.stop()
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if not last and released:
+        # 实体卸载后其 unique_id 才可用，再把通道转交给仍加载的条目
+        kinds = hub.hand_over(released)
+        if kinds:
+            await hub.poller.async_refresh(kinds)
+    if not last and owned:
+        # 网关级选项改由新的持有条目提供
+        owner = hass.config_entries.async_get_entry(hub.owner)
+        _apply_options(owner, hub)
+        await _async_apply_recorder(hass, owner, hub.assistant)
+    if hub and last:
+        # 保留设备模型供重载复用，仅释放网关连接
+        await hass.async_add_executor_job(hub.assistant.close)
+        await hass.async_add_executor_job(hub.assistant.set_recorder, None)
+    if not loaded_hubs():
+        async_unload_services(hass)
+    return unload_ok
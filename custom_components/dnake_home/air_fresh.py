@@ -1,83 +1,62 @@
 import logging
-from homeassistant.core import HomeAssistant
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.components.fan import FanEntity, FanEntityFeature
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.util.percentage import (
     ordered_list_item_to_percentage,
     percentage_to_ordered_list_item,
 )
 
-from .core.assistant import assistant
 from .core.constant import DOMAIN, MANUFACTURER
+from .core.registry import AIR_FRESH, AIR_FRESH_SPEEDS
 
 _LOGGER = logging.getLogger(__name__)
 
-SPEED_LIST = ["low", "medium", "high"]
-SPEED_MAP = {"low": 1, "medium": 2, "high": 3}
+SPEED_LIST = list(AIR_FRESH_SPEEDS.keys)
 
 
-def load_air_fresh_devices(device_list):
-    air_fresh_devices = [
-        DnakeAirFresh(device) for device in device_list if device.get("devType") == 1792
-    ]
+def load_air_fresh_devices(hub, device_list):
+    air_fresh_devices = [DnakeAirFresh(hub, device) for device in device_list]
     _LOGGER.info(f"find air fresh num: {len(air_fresh_devices)}")
-    assistant.entries["air_fresh"] = air_fresh_devices
+    return air_fresh_devices
 
 
-def update_air_fresh_state(states):
-    air_fresh_devices = assistant.entries.get("air_fresh", [])
-    for device in air_fresh_devices:
-        state = next((state for state in states if device.is_hint_state(state)), None)
+def update_air_fresh_state(states, entities):
+    if not states:
+        return
+    for device in entities:
+        state = states.get(device.state_key)
         if state:
             device.update_state(state)
 
 
-async def async_setup_entry(
-    hass: HomeAssistant,
-    entry: ConfigEntry,
-    async_add_entities: AddEntitiesCallback,
-):
-    air_fresh_list = assistant.entries.get("air_fresh", [])
-    if air_fresh_list:
-        async_add_entities(air_fresh_list)
-
-
 class DnakeAirFresh(FanEntity):
 
-    def __init__(self, device):
-        self._name = device.get("devName")
+    _attr_should_poll = False
+    _attr_speed_count = len(SPEED_LIST)
+    _attr_supported_features = FanEntityFeature.SET_SPEED
+
+    def __init__(self, hub, device):
+        name = device.get("devName")
         gateway_info = device.get("gatewayDeviceInfo", {})
         self._dev_no = gateway_info.get("devNo")
         self._dev_ch = gateway_info.get("devCh")
-        self._is_on = False
-        self._percentage = 0
-
-    def is_hint_state(self, state):
-        return state.get("devNo") == self._dev_no and state.get("devCh") == self._dev_ch
-
-    @property
-    def unique_id(self):
-        return f"dnake_air_fresh_{self._dev_ch}_{self._dev_no}"
-
-    @property
-    def device_info(self):
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"air_fresh_{self._dev_ch}_{self._dev_no}")},
-            name=self._name,
+        self.state_key = (self._dev_no, self._dev_ch)
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = hub.scoped(
+            f"dnake_air_fresh_{self._dev_ch}_{self._dev_no}"
+        )
+        self._attr_device_info = DeviceInfo(
+            identifiers={
+                (DOMAIN, hub.scoped(f"air_fresh_{self._dev_ch}_{self._dev_no}"))
+            },
+            name=name,
             manufacturer=MANUFACTURER,
-            model="新风系统",
-            via_device=(DOMAIN, "gateway"),
+            model=AIR_FRESH.model,
+            via_device=(DOMAIN, hub.scoped("gateway")),
         )
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def name(self):
-        return self._name
+        self._is_on = False
+        self._percentage = 0
 
     @property
     def is_on(self):
@@ -87,23 +66,14 @@ class DnakeAirFresh(FanEntity):
     def percentage(self):
         return self._percentage
 
-    @property
-    def speed_count(self):
-        return len(SPEED_LIST)
-
-    @property
-    def supported_features(self):
-        return FanEntityFeature.SET_SPEED
-
     async def async_turn_on(self, percentage=None, preset_mode=None, **kwargs):
         if percentage is not None:
             speed = percentage_to_ordered_list_item(SPEED_LIST, percentage)
-            wind_speed = SPEED_MAP[speed]
             is_success = await self.hass.async_add_executor_job(
-                assistant.set_air_fresh_wind_speed,
+                self._hub.assistant.set_air_fresh_wind_speed,
                 self._dev_no,
                 self._dev_ch,
-                wind_speed,
+                speed,
             )
             if is_success:
                 self._percentage = percentage
@@ -111,7 +81,7 @@ class DnakeAirFresh(FanEntity):
                 self.async_write_ha_state()
         else:
             is_success = await self.hass.async_add_executor_job(
-                assistant.set_air_fresh_power,
+                self._hub.assistant.set_air_fresh_power,
                 self._dev_no,
                 self._dev_ch,
                 True,
@@ -124,7 +94,7 @@ class DnakeAirFresh(FanEntity):
 
     async def async_turn_off(self, **kwargs):
         is_success = await self.hass.async_add_executor_job(
-            assistant.set_air_fresh_power,
+            self._hub.assistant.set_air_fresh_power,
             self._dev_no,
             self._dev_ch,
             False,
@@ -138,12 +108,11 @@ class DnakeAirFresh(FanEntity):
             await self.async_turn_off()
         else:
             speed = percentage_to_ordered_list_item(SPEED_LIST, percentage)
-            wind_speed = SPEED_MAP[speed]
             is_success = await self.hass.async_add_executor_job(
-                assistant.set_air_fresh_wind_speed,
+                self._hub.assistant.set_air_fresh_wind_speed,
                 self._dev_no,
                 self._dev_ch,
-                wind_speed,
+                speed,
             )
             if is_success:
                 self._percentage = percentage
@@ -151,14 +120,11 @@ class DnakeAirFresh(FanEntity):
                 self.async_write_ha_state()
 
     def update_state(self, state):
-        reports = state.get("reports", {})
-        power_on = reports.get("powerOn", 0)
-        wind_speed = reports.get("windSpeed", 1)
-        
-        self._is_on = power_on == 1
-        
-        if self._is_on and wind_speed in [1, 2, 3]:
-            speed_name = next((k for k, v in SPEED_MAP.items() if v == wind_speed), "low")
+        values = AIR_FRESH.decode(state.get("reports", {}))
+        self._is_on = values["power_on"] == 1
+
+        speed_name = values["wind_speed"]
+        if self._is_on and speed_name is not None:
             self._percentage = ordered_list_item_to_percentage(SPEED_LIST, speed_name)
         else:
             self._percentage = 0
@@ -7,45 +7,37 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.components.climate.const import (
     FAN_LOW,
-    FAN_MIDDLE,
-    FAN_HIGH,
     ClimateEntityFeature,
     HVACMode,
 )
 
-from .core.assistant import assistant
-from .core.utils import get_key_by_value
+from .core.filters import MeasurementFilter
 from .core.constant import DOMAIN, MANUFACTURER
+from .core.registry import AIR_CONDITION, FAN_MODES, HVAC_MODES
+from .core.slicer import async_add_in_slices
 
 _LOGGER = logging.getLogger(__name__)
 
-_hvac_table = {
-    HVACMode.OFF: 0,
-    HVACMode.HEAT: 4,
-    HVACMode.COOL: 3,
-    HVACMode.FAN_ONLY: 7,
-    HVACMode.DRY: 8,
-}
+_hvac_modes = [HVACMode(mode) for mode in HVAC_MODES.keys]
 
-_fan_table = {FAN_LOW: 1, FAN_MIDDLE: 2, FAN_HIGH: 3}
+_fan_modes = list(FAN_MODES.keys)
 
 _min_temperature = 16
 
 _max_temperature = 32
 
 
-def load_climates(device_list):
-    climates = [
-        DnakeClimate(device) for device in device_list if device.get("devType") == 1536
-    ]
+def load_climates(hub, device_list):
+    climates = [DnakeClimate(hub, device) for device in device_list]
     _LOGGER.info(f"find climate num: {len(climates)}")
-    assistant.entries["climate"] = climates
+    return climates
 
 
-def update_climates_state(states):
-    climates = assistant.entries["climate"]
-    for climate in climates:
-        state = next((state for state in states if climate.is_hint_state(state)), None)
+def update_climates_state(states, entities):
+    if not states:
+        return
+    for climate in entities:
+        state = states.get(climate.state_key)
         if state:
             climate.update_state(state)
 
@@ -55,8 +47,11 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ):
-    climate_list = assistant.entries["climate"]
-    floor_heating_list = assistant.entries["floor_heating"]
+    subscription = hass.data[DOMAIN][entry.entry_id].subscriptions[entry.entry_id]
+    subscription.add_entities["climate"] = async_add_entities
+    subscription.add_entities["floor_heating"] = async_add_entities
+    climate_list = subscription.entities["climate"]
+    floor_heating_list = subscription.entities["floor_heating"]
     
     entities = []
     if climate_list:
@@ -65,45 +60,45 @@ async def async_setup_entry(
         entities.extend(floor_heating_list)
     
     if entities:
-        async_add_entities(entities)
+        await async_add_in_slices(async_add_entities, entities)
 
 
 class DnakeClimate(ClimateEntity):
 
-    def __init__(self, device):
-        self._name = device.get("devName")
+    _attr_should_poll = False
+    _attr_hvac_modes = _hvac_modes
+    _attr_fan_modes = _fan_modes
+    _attr_min_temp = _min_temperature
+    _attr_max_temp = _max_temperature
+    _attr_target_temperature_step = 1
+    _attr_temperature_unit = UnitOfTemperature.CELSIUS
+    _attr_supported_features = (
+        ClimateEntityFeature.TARGET_TEMPERATURE | ClimateEntityFeature.FAN_MODE
+    )
+
+    def __init__(self, hub, device):
+        name = device.get("devName")
         gateway_info = device.get("gatewayDeviceInfo", {})
         self._dev_no = gateway_info.get("devNo")
         self._dev_ch = gateway_info.get("devCh")
+        self.state_key = (self._dev_no, self._dev_ch)
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = hub.scoped(f"dnake_{self._dev_ch}_{self._dev_no}")
+        self._attr_device_info = DeviceInfo(
+            identifiers={
+                (DOMAIN, hub.scoped(f"climate_{self._dev_ch}_{self._dev_no}"))
+            },
+            name=name,
+            manufacturer=MANUFACTURER,
+            model=AIR_CONDITION.model,
+            via_device=(DOMAIN, hub.scoped("gateway")),
+        )
         self._target_temperature = _min_temperature
         self._current_temperature = _min_temperature
         self._hvac_mode = HVACMode.OFF
         self._fan_mode = FAN_LOW
-
-    def is_hint_state(self, state):
-        return state.get("devNo") == self._dev_no and state.get("devCh") == self._dev_ch
-
-    @property
-    def unique_id(self):
-        return f"dnake_{self._dev_ch}_{self._dev_no}"
-
-    @property
-    def device_info(self):
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"climate_{self._dev_ch}_{self._dev_no}")},
-            name=self._name,
-            manufacturer=MANUFACTURER,
-            model="空调控制",
-            via_device=(DOMAIN, "gateway"),
-        )
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def name(self):
-        return self._name
+        self._temperature_filter = MeasurementFilter(hub.temperature_filter)
 
     @property
     def target_temperature(self):
@@ -113,45 +108,17 @@ class DnakeClimate(ClimateEntity):
     def current_temperature(self):
         return self._current_temperature
 
-    @property
-    def min_temp(self):
-        return _min_temperature
-
-    @property
-    def max_temp(self):
-        return _max_temperature
-
-    @property
-    def target_temperature_step(self):
-        return 1
-
     @property
     def hvac_mode(self):
         return self._hvac_mode
 
-    @property
-    def hvac_modes(self):
-        return list(_hvac_table.keys())
-
     @property
     def fan_mode(self):
         return self._fan_mode
 
-    @property
-    def fan_modes(self):
-        return list(_fan_table.keys())
-
-    @property
-    def temperature_unit(self):
-        return UnitOfTemperature.CELSIUS
-
-    @property
-    def supported_features(self):
-        return ClimateEntityFeature.TARGET_TEMPERATURE | ClimateEntityFeature.FAN_MODE
-
     async def _async_turn_to(self, is_open: bool):
         return await self.hass.async_add_executor_job(
-            assistant.set_air_condition_power,
+            self._hub.assistant.set_air_condition_power,
             self._dev_no,
             self._dev_ch,
             is_open,
@@ -160,7 +127,7 @@ class DnakeClimate(ClimateEntity):
     async def async_set_temperature(self, **kwargs):
         temperature = kwargs.get("temperature")
         is_success = await self.hass.async_add_executor_job(
-            assistant.set_air_condition_temperature,
+            self._hub.assistant.set_air_condition_temperature,
             self._dev_no,
             self._dev_ch,
             temperature,
@@ -181,10 +148,10 @@ class DnakeClimate(ClimateEntity):
                 if not open_success:
                     return
             switch_success = await self.hass.async_add_executor_job(
-                assistant.set_air_condition_mode,
+                self._hub.assistant.set_air_condition_mode,
                 self._dev_no,
                 self._dev_ch,
-                _hvac_table[hvac_mode],
+                hvac_mode,
             )
             if switch_success:
                 self._hvac_mode = hvac_mode
@@ -192,22 +159,40 @@ class DnakeClimate(ClimateEntity):
 
     async def async_set_fan_mode(self, fan_mode):
         is_success = await self.hass.async_add_executor_job(
-            assistant.set_air_condition_fan,
+            self._hub.assistant.set_air_condition_fan,
             self._dev_no,
             self._dev_ch,
-            _fan_table[fan_mode],
+            fan_mode,
         )
         if is_success:
             self._fan_mode = fan_mode
             self.async_write_ha_state()
 
     def update_state(self, state):
-        self._target_temperature = state.get("reports", {}).get("temp", _min_temperature)/100
-        self._current_temperature = state.get("reports", {}).get("tempIndoor", _min_temperature)/100
-        self._fan_mode = get_key_by_value(_fan_table, state.get("reports", {}).get("windSpeed"), FAN_LOW)
-        if state.get("reports", {}).get("powerOn", 0) == 0:
-            self._hvac_mode = HVACMode.OFF
+        values = AIR_CONDITION.decode(state.get("reports", {}))
+        if values["power_on"] == 0:
+            hvac_mode = HVACMode.OFF
         else:
-            mode = state.get("reports", {}).get("airMode")
-            self._hvac_mode = get_key_by_value(_hvac_table, mode, HVACMode.OFF)
+            hvac_mode = HVACMode(values["air_mode"])
+        new_state = (
+            values["temp"],
+            self._temperature_filter.update(values["temp_indoor"]),
+            values["wind_speed"],
+            hvac_mode,
+        )
+        old_state = (
+            self._target_temperature,
+            self._current_temperature,
+            self._fan_mode,
+            self._hvac_mode,
+        )
+        # 室内温度抖动被过滤后状态未变化，不写入 HA
+        if new_state == old_state:
+            return
+        (
+            self._target_temperature,
+            self._current_temperature,
+            self._fan_mode,
+            self._hvac_mode,
+        ) = new_state
         self.async_write_ha_state()
@@ -1,38 +1,277 @@
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.components import network, webhook
+from homeassistant.const import CONF_WEBHOOK_ID
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.selector import (
+    SelectSelector,
+    SelectSelectorConfig,
+    SelectSelectorMode,
+)
 
-from .core.constant import DOMAIN, TITLE
+from .core.constant import (
+    DOMAIN,
+    TITLE,
+    CONF_CHANNELS,
+    CONF_COMMAND_QUEUE,
+    CONF_COMMAND_TTL,
+    CONF_COVER_POLL_INTERVAL,
+    CONF_GW_IOT_NAME,
+    CONF_SCOPED_IDS,
+    CONF_MAX_INFLIGHT,
+    CONF_POLL_TIERS,
+    CONF_PUSH_ENABLED,
+    CONF_PUSH_RECONCILE_INTERVAL,
+    CONF_RECORD_TRAFFIC,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SCAN_INTERVAL,
+    CONF_TEMP_DEADBAND,
+    CONF_TEMP_MIN_INTERVAL,
+    DEFAULT_COVER_POLL_INTERVAL,
+    DEFAULT_MAX_INFLIGHT,
+    DEFAULT_POLL_TIERS,
+    DEFAULT_PUSH_RECONCILE_INTERVAL,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_SCAN_INTERVAL,
+)
+from .core.channels import ChannelFilter
+from .core.command_queue import DEFAULT_COMMAND_TTL
+from .core.filters import temperature_filter_settings
+from .core.discovery import (
+    CannotConnect,
+    InvalidAuth,
+    async_discover_gateways,
+    async_validate_gateway,
+)
+
+
+async def _async_local_networks(hass):
+    networks = []
+    for adapter in await network.async_get_adapters(hass):
+        if not adapter["enabled"]:
+            continue
+        for ipv4 in adapter["ipv4"]:
+            networks.append((ipv4["address"], ipv4["network_prefix"]))
+    return networks
 
 
 class DNakeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self):
+        self._discovered = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return DNakeOptionsFlow(config_entry)
+
+    def _scoped_ids(self, gw_iot_name, gateway_ip):
+        """
+        Entries of an already added gateway follow it; a new gateway gets
+        prefixed ids only if another gateway is already set up, so existing
+        entities keep theirs.
+        """
+        entries = self._async_current_entries()
+        for entry in entries:
+            if (
+                entry.data.get(CONF_GW_IOT_NAME) == gw_iot_name
+                or entry.data.get("gateway_ip") == gateway_ip
+            ):
+                return entry.data.get(CONF_SCOPED_IDS, False)
+        return bool(entries)
+
     async def async_step_user(self, user_input=None):
+        errors = {}
+        session = async_get_clientsession(self.hass)
         if user_input:
-            return self.async_create_entry(title=TITLE, data=user_input)
-        else:
-            default_values = {
-                "gateway_ip": "192.168.1.2",
-                "auth_username": "admin",
-                "auth_password": "123456",
-                "scan_interval": 10,
+            try:
+                channels = ChannelFilter(user_input.get(CONF_CHANNELS, ""))
+                iot_info = await async_validate_gateway(
+                    session,
+                    user_input["gateway_ip"],
+                    user_input["auth_username"],
+                    user_input["auth_password"],
+                )
+            except ValueError:
+                errors[CONF_CHANNELS] = "invalid_channels"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            else:
+                # 同一网关可按不同通道范围添加多个条目
+                gw_iot_name = iot_info["gw_iot_name"]
+                unique_id = gw_iot_name
+                title = TITLE
+                if not channels.everything:
+                    unique_id = f"{gw_iot_name}/{channels}"
+                    title = f"{TITLE} ({channels})"
+                await self.async_set_unique_id(unique_id)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title=title,
+                    data={
+                        **user_input,
+                        CONF_CHANNELS: str(channels),
+                        CONF_GW_IOT_NAME: gw_iot_name,
+                        CONF_SCOPED_IDS: self._scoped_ids(
+                            gw_iot_name, user_input["gateway_ip"]
+                        ),
+                    },
+                )
+
+        if self._discovered is None:
+            networks = await _async_local_networks(self.hass)
+            self._discovered = await async_discover_gateways(session, networks)
+
+        default_values = {
+            "gateway_ip": self._discovered[0] if self._discovered else "192.168.1.2",
+            "auth_username": "admin",
+            "auth_password": "123456",
+            "scan_interval": 10,
+            CONF_CHANNELS: "",
+        }
+        if user_input:
+            default_values.update(user_input)
+        # 发现网关时提供下拉选择，仍允许手动输入
+        gateway_ip_selector = (
+            SelectSelector(
+                SelectSelectorConfig(
+                    options=self._discovered,
+                    custom_value=True,
+                    mode=SelectSelectorMode.DROPDOWN,
+                )
+            )
+            if self._discovered
+            else str
+        )
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        "gateway_ip", default=default_values["gateway_ip"]
+                    ): gateway_ip_selector,
+                    vol.Required(
+                        "auth_username", default=default_values["auth_username"]
+                    ): str,
+                    vol.Required(
+                        "auth_password", default=default_values["auth_password"]
+                    ): str,
+                    vol.Optional(
+                        "scan_interval", default=default_values["scan_interval"]
+                    ): int,
+                    vol.Optional(
+                        CONF_CHANNELS, default=default_values[CONF_CHANNELS]
+                    ): str,
+                }
+            ),
+            description_placeholders={"found": str(len(self._discovered))},
+            errors=errors,
+        )
+
+
+def _tier_key(kind):
+    return f"{CONF_POLL_TIERS}_{kind}"
+
+
+class DNakeOptionsFlow(config_entries.OptionsFlow):
+    """Poller/transport tuning, applied live by the entry update listener"""
+
+    def __init__(self, config_entry):
+        self._entry = config_entry
+
+    def _current(self, key, default):
+        return self._entry.options.get(key, self._entry.data.get(key, default))
+
+    def _tier_fields(self):
+        # 每类设备一个字段，保存时合并为 poll_tiers
+        tiers = {**DEFAULT_POLL_TIERS, **(self._current(CONF_POLL_TIERS, None) or {})}
+        return {
+            vol.Required(_tier_key(kind), default=tiers[kind]): vol.All(
+                int, vol.Range(min=1, max=360)
+            )
+            for kind in DEFAULT_POLL_TIERS
+        }
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            user_input = dict(user_input)
+            user_input[CONF_POLL_TIERS] = {
+                kind: user_input.pop(_tier_key(kind)) for kind in DEFAULT_POLL_TIERS
             }
-            return self.async_show_form(
-                step_id="user",
-                data_schema=vol.Schema(
-                    {
-                        vol.Required(
-                            "gateway_ip", default=default_values["gateway_ip"]
-                        ): str,
-                        vol.Required(
-                            "auth_username", default=default_values["auth_username"]
-                        ): str,
-                        vol.Required(
-                            "auth_password", default=default_values["auth_password"]
-                        ): str,
-                        vol.Optional(
-                            "scan_interval", default=default_values["scan_interval"]
-                        ): int,
-                    }
-                ),
+            return self.async_create_entry(
+                title="", data={**self._entry.options, **user_input}
             )
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SCAN_INTERVAL,
+                        default=self._current(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+                    ): vol.All(int, vol.Range(min=1, max=3600)),
+                    **self._tier_fields(),
+                    vol.Required(
+                        CONF_REQUEST_TIMEOUT,
+                        default=self._current(
+                            CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=60)),
+                    vol.Required(
+                        CONF_MAX_INFLIGHT,
+                        default=self._current(CONF_MAX_INFLIGHT, DEFAULT_MAX_INFLIGHT),
+                    ): vol.All(int, vol.Range(min=1, max=32)),
+                    vol.Required(
+                        CONF_COVER_POLL_INTERVAL,
+                        default=self._current(
+                            CONF_COVER_POLL_INTERVAL, DEFAULT_COVER_POLL_INTERVAL
+                        ),
+                    ): vol.All(int, vol.Range(min=100, max=10000)),
+                    vol.Required(
+                        CONF_TEMP_DEADBAND,
+                        default=self._current(
+                            CONF_TEMP_DEADBAND, temperature_filter_settings.deadband
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                    vol.Required(
+                        CONF_TEMP_MIN_INTERVAL,
+                        default=self._current(
+                            CONF_TEMP_MIN_INTERVAL,
+                            temperature_filter_settings.min_interval,
+                        ),
+                    ): vol.All(int, vol.Range(min=0, max=3600)),
+                    vol.Required(
+                        CONF_RECORD_TRAFFIC,
+                        default=self._current(CONF_RECORD_TRAFFIC, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_COMMAND_QUEUE,
+                        default=self._current(CONF_COMMAND_QUEUE, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_COMMAND_TTL,
+                        default=self._current(CONF_COMMAND_TTL, DEFAULT_COMMAND_TTL),
+                    ): vol.All(int, vol.Range(min=5, max=3600)),
+                    vol.Required(
+                        CONF_PUSH_ENABLED,
+                        default=self._current(CONF_PUSH_ENABLED, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_PUSH_RECONCILE_INTERVAL,
+                        default=self._current(
+                            CONF_PUSH_RECONCILE_INTERVAL,
+                            DEFAULT_PUSH_RECONCILE_INTERVAL,
+                        ),
+                    ): vol.All(int, vol.Range(min=30, max=86400)),
+                }
+            ),
+            description_placeholders={"push_path": self._push_path()},
+        )
+
+    def _push_path(self):
+        # webhook 在首次开启推送时生成，之后地址不变
+        webhook_id = self._entry.data.get(CONF_WEBHOOK_ID)
+        return webhook.async_generate_path(webhook_id) if webhook_id else "-"
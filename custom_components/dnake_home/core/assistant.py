@@ -1,10 +1,27 @@
 import logging
+import threading
+import time
 import requests
 
-from .constant import Action, Cmd, Power
+from .constant import (
+    DEFAULT_MAX_INFLIGHT,
+    DEFAULT_REQUEST_TIMEOUT,
+    Action,
+    Cmd,
+    Power,
+)
+from .command_queue import QUEUED, REPLAY_PROBE_INTERVAL, coalesce_key
+from .deadline import Cancelled, Deadline
+from .limiter import AdaptiveLimiter
+from .log import CONTROL, TRANSPORT, RateLimitedLogger, Truncated, get_logger
+from .registry import AIR_CONDITION, AIR_FRESH, COVER, FLOOR_HEATING
+from .single_flight import SingleFlight
 from .utils import encode_auth, get_uuid
 
 _LOGGER = logging.getLogger(__name__)
+_TRANSPORT_LOGGER = get_logger(TRANSPORT)
+_CONTROL_LOGGER = get_logger(CONTROL)
+_LIMITED_LOGGER = RateLimitedLogger(_TRANSPORT_LOGGER)
 
 
 class __AssistantCore:
@@ -13,17 +30,65 @@ class __AssistantCore:
         self.auth = None
         self.from_device = None
         self.to_device = None
-        self.entries = {}
+        # 可选的网关流量录制器（TrafficRecorder）
+        self.recorder = None
+        # 可选的性能分析器（CycleProfiler），记录网关耗时
+        self.profiler = None
+        self._session = None
+        self.timeout = DEFAULT_REQUEST_TIMEOUT
+        self.limiter = AdaptiveLimiter(DEFAULT_MAX_INFLIGHT)
+        self._reads = SingleFlight()
+        # 可选的离线命令队列（CommandQueue），网关恢复后重放
+        self.command_queue = None
+        self.offline = False
+        self._replay_lock = threading.Lock()
+        # 重放线程：探测网关恢复并重放队列，不占用业务请求的线程
+        self._replayer = None
+        self._replay_stop = threading.Event()
+        # 每个通道进行中开关类命令的 Deadline，新命令到来时取消旧命令
+        self._commands = {}
+        # 每个通道最后一个字段类命令的完成事件，后来的命令排在其后发送
+        self._field_commands = {}
+        self._commands_lock = threading.Lock()
 
     def bind_auth_info(self, gw_ip, auth_name, auth_psw):
         self.gw_ip = gw_ip
         self.auth = encode_auth(auth_name, auth_psw)
-        _LOGGER.info(f"bind auth info: ip={self.gw_ip},auth={self.auth}")
+        _LOGGER.info("bind auth info: ip=%s,user=%s", self.gw_ip, auth_name)
+
+    def configure(self, timeout=None, max_inflight=None):
+        """Retune the transport; takes effect for the next request"""
+        if timeout is not None:
+            self.timeout = timeout
+        if max_inflight is not None:
+            self.limiter.set_max_limit(max_inflight)
+
+    def set_command_queue(self, command_queue):
+        """Enable (or with None, disable) queueing commands while offline"""
+        self.command_queue = command_queue
 
     def bind_iot_info(self, iot_device_name, gw_iot_name):
         self.from_device = iot_device_name
         self.to_device = gw_iot_name
-        _LOGGER.info(f"bind iot info: from={self.from_device},to={self.to_device}")
+        _LOGGER.info("bind iot info: from=%s,to=%s", self.from_device, self.to_device)
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def close(self):
+        """Drop pooled gateway connections; a later request reopens them"""
+        self._replay_stop.set()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def set_recorder(self, recorder):
+        """Start (or with None, stop) recording gateway traffic"""
+        previous, self.recorder = self.recorder, recorder
+        if previous is not None:
+            previous.close()
 
     def _get_url(self, path):
         return f"http://{self.gw_ip}{path}"
@@ -35,43 +100,196 @@ class __AssistantCore:
             "Authorization": f"Basic {self.auth}",
         }
 
-    def get(self, path):
+    def get(self, path, deadline: Deadline = None):
+        started = time.monotonic()
+        resp = self._get(path, deadline)
+        elapsed = time.monotonic() - started
+        if self.recorder:
+            self.recorder.record("get", path, resp, started, elapsed)
+        if self.profiler:
+            self.profiler.add("gateway", elapsed)
+        return resp
+
+    def post(self, data: dict, deadline: Deadline = None):
+        started = time.monotonic()
+        resp = self._post(data, deadline)
+        elapsed = time.monotonic() - started
+        if self.recorder:
+            self.recorder.record("post", data, resp, started, elapsed)
+        if self.profiler:
+            self.profiler.add("gateway", elapsed)
+        return resp
+
+    def _send(self, method, url, deadline: Deadline = None, **kwargs):
+        """
+        Send one request under the adaptive limiter and report its outcome.
+        Raises ``Cancelled`` if ``deadline`` ends before the request is sent
+        or while it is running with a timeout capped to the time left.
+        """
+        if deadline is not None:
+            deadline.check()
+        if not self.limiter.acquire(deadline=deadline):
+            raise Cancelled("no request slot before deadline")
+        try:
+            timeout = self.timeout
+            capped = False
+            if deadline is not None:
+                deadline.check()
+                remaining = deadline.remaining()
+                if remaining is not None and remaining < timeout:
+                    timeout, capped = remaining, True
+            started = time.monotonic()
+            try:
+                resp = self._get_session().request(
+                    method,
+                    url,
+                    headers=self._get_header(),
+                    timeout=timeout,
+                    **kwargs,
+                )
+                resp.raise_for_status()
+            except (
+                requests.exceptions.Timeout,
+                requests.exceptions.ConnectionError,
+            ) as e:
+                # 超时由调用方的 deadline 造成时不算网关故障
+                if capped and isinstance(e, requests.exceptions.Timeout):
+                    raise Cancelled("deadline exceeded") from e
+                self.offline = True
+                self.limiter.on_failure()
+                raise
+            except requests.exceptions.HTTPError:
+                # 5xx 视为网关过载，4xx 是请求本身的问题
+                if resp.status_code >= 500:
+                    self.limiter.on_failure()
+                raise
+            self.offline = False
+            self.limiter.on_success(time.monotonic() - started)
+            return resp
+        finally:
+            self.limiter.release()
+
+    def _get(self, path, deadline: Deadline = None):
         try:
-            url = self._get_url(path)
-            resp = requests.get(url, headers=self._get_header())
-            resp.raise_for_status()
+            resp = self._send("GET", self._get_url(path), deadline)
+            _LIMITED_LOGGER.reset(("get", path))
             return resp.json()
+        except Cancelled as e:
+            _TRANSPORT_LOGGER.debug("get %s dropped: %s", path, e)
+            return None
         except requests.exceptions.RequestException as e:
-            _LOGGER.error("get error: path=%s,err=%s", path, e)
+            _LIMITED_LOGGER.error(("get", path), "get error: path=%s,err=%s", path, e)
             return None
 
-    def post(self, data: dict):
+    def _post(self, data: dict, deadline: Deadline = None):
         try:
-            url = self._get_url("/route.cgi?api=request")
             data["uuid"] = get_uuid()
-            resp = requests.post(
-                url,
-                headers=self._get_header(),
+            resp = self._send(
+                "POST",
+                self._get_url("/route.cgi?api=request"),
+                deadline,
                 json={
                     "fromDev": self.from_device,
                     "toDev": self.to_device,
                     "data": data,
                 },
             )
-            resp.raise_for_status()
+            _LIMITED_LOGGER.reset(("post", data.get("action")))
             return resp.json()
+        except Cancelled as e:
+            _TRANSPORT_LOGGER.debug("post dropped: data=%s,reason=%s", Truncated(data), e)
+            return None
         except requests.exceptions.RequestException as e:
-            _LOGGER.error("post error: data=%s,err=%s", data, e)
+            _LIMITED_LOGGER.error(
+                ("post", data.get("action")),
+                "post error: data=%s,err=%s",
+                Truncated(data),
+                e,
+            )
             return None
 
-    def do_action(self, data: dict):
-        _LOGGER.error(f"post data: {data}")
-        resp = self.post(data)
-        _LOGGER.error(f"post resp: {resp}")
+    def _read_with(self, data: dict, deadline: Deadline = None):
+        return self.post(data, deadline), deadline
+
+    def read(self, data: dict, deadline: Deadline = None):
+        """
+        Post a readDev request, sharing the response with any identical
+        request already in flight (same devNo/devCh/fields/scope...).
+        A read dropped because of the first caller's deadline is not shared:
+        the others retry under their own deadline.
+        """
+        key = SingleFlight.make_key(data)
+        while True:
+            result, used = self._reads.do(key, self._read_with, dict(data), deadline)
+            if result is not None or used is deadline or used is None or not used.done:
+                return result
+            if deadline is not None and deadline.done:
+                return None
+            _TRANSPORT_LOGGER.debug("shared read was dropped, retrying: %s", Truncated(data))
+
+    def do_action(self, data: dict, deadline: Deadline = None):
+        """
+        Post a ctrlDev command. Returns ``QUEUED`` (truthy) if the gateway is
+        offline and the command was queued for replay, else whether it was ok.
+        """
+        _CONTROL_LOGGER.debug("post data: %s", Truncated(data))
+        if self.command_queue is not None and self.offline:
+            # 网关不可达时直接入队，等待恢复后重放
+            return self._queue_command(data, "gateway offline, command queued")
+        resp = self.post(data, deadline)
+        _CONTROL_LOGGER.debug("post resp: %s", Truncated(resp))
+        if resp is None and self.command_queue is not None and self.offline:
+            return self._queue_command(data, "command failed, queued")
         return resp and resp.get("result") == "ok"
 
+    def _queue_command(self, data: dict, message):
+        self.command_queue.put(data)
+        _CONTROL_LOGGER.info("%s: %s", message, Truncated(data))
+        self._start_replayer()
+        return QUEUED
+
+    def _start_replayer(self):
+        with self._replay_lock:
+            if self._replayer is not None:
+                return
+            self._replay_stop.clear()
+            self._replayer = threading.Thread(
+                target=self._replay_queue, name="dnake_home_replay", daemon=True
+            )
+            self._replayer.start()
+
+    def _replay_queue(self):
+        """Probe the gateway until it is back, then replay queued commands"""
+        while not self._replay_stop.is_set():
+            queue = self.command_queue
+            with self._replay_lock:
+                # 在锁内判断退出，入队后启动线程的调用不会被漏掉
+                if queue is None or not len(queue):
+                    self._replayer = None
+                    return
+            if self.offline and self.get("/smart/iot.info") is None:
+                self._replay_stop.wait(REPLAY_PROBE_INTERVAL)
+                continue
+            commands = queue.drain()
+            for index, (_, command) in enumerate(commands):
+                if self._replay_stop.is_set():
+                    queue.requeue(commands[index:])
+                    break
+                resp = self.post(dict(command))
+                if resp is None and self.offline:
+                    queue.requeue(commands[index:])
+                    break
+                _CONTROL_LOGGER.info(
+                    "replayed queued command: %s -> %s",
+                    Truncated(command),
+                    Truncated(resp),
+                )
+        with self._replay_lock:
+            self._replayer = None
+
 
 class Assistant(__AssistantCore):
+    """Requests to one gateway; each loaded gateway has its own instance"""
 
     def query_iot_info(self):
         iot_info = self.get("/smart/iot.info")
@@ -92,7 +310,9 @@ class Assistant(__AssistantCore):
             _LOGGER.error("query device info fail")
             return None
 
-    def read_dev_state(self, dev_no, dev_ch, dev_type=None, code=None):
+    def read_dev_state(
+        self, dev_no, dev_ch, dev_type=None, code=None, deadline: Deadline = None
+    ):
         data = {
             "action": Action.ReadDev.value,
             "devNo": dev_no,
@@ -103,19 +323,28 @@ class Assistant(__AssistantCore):
         if code is not None and code != -1:
             data["code"] = code
             
-        state_info = self.post(data)
+        state_info = self.read(data, deadline)
         if state_info:
             return state_info
+        elif deadline is not None and deadline.done:
+            return None
         else:
-            _LOGGER.error(f"query device status fail: devNo={dev_no},devCh={dev_ch}")
+            _LIMITED_LOGGER.error(
+                ("read_dev_state", dev_no, dev_ch),
+                "query device status fail: devNo=%s,devCh=%s",
+                dev_no,
+                dev_ch,
+            )
             return None
 
-    def read_all_dev_state(self, udid=0):
+    def read_all_dev_state(self, udid=0, dev_type=None, deadline: Deadline = None):
         """
         Read all device states - matches web interface API
         
         Args:
             udid: Device ID filter (default: 0 for all devices)
+            dev_type: Only read channels of this devType (default: all types)
+            deadline: Drop the read once this deadline ends
             
         Returns:
             list: Device list with state information, or None if failed
@@ -127,8 +356,10 @@ class Assistant(__AssistantCore):
             "index": 0,
             "udid": udid
         }
+        if dev_type is not None:
+            data["devType"] = dev_type
         
-        state_info = self.post(data)
+        state_info = self.read(data, deadline)
         if state_info and state_info.get("result") == "ok":
             dev_list = state_info.get("devList", [])
             page_no = state_info.get("pageNo", 1)
@@ -156,12 +387,33 @@ class Assistant(__AssistantCore):
                     processed_device["configs"] = device["configs"]
                     
                 processed_devices.append(processed_device)
-            _LOGGER.error(f"read_all_dev_state response: {processed_devices} devices")
+            _TRANSPORT_LOGGER.debug(
+                "read_all_dev_state response: %d devices, page %s/%s: %s",
+                len(processed_devices),
+                page_no,
+                total_page,
+                Truncated(processed_devices),
+            )
             return processed_devices
+        elif deadline is not None and deadline.done:
+            return None
         else:
-            _LOGGER.error("query all device status fail")
+            _LIMITED_LOGGER.error("read_all_dev_state", "query all device status fail")
             return None
 
+    def read_dev_page(self, fields="state", index=0, udid=0, dev_type=None):
+        """Raw readDev response for one page of a scope=all read"""
+        data = {
+            "action": Action.ReadDev.value,
+            "fields": fields,
+            "scope": "all",
+            "index": index,
+            "udid": udid,
+        }
+        if dev_type is not None:
+            data["devType"] = dev_type
+        return self.read(data)
+
     def read_all_dbus_devices(self):
         """Read all device profiles from dbus - matches JavaScript readAllDbusDevices"""
         data = {
@@ -171,7 +423,7 @@ class Assistant(__AssistantCore):
             "index": 0
         }
         
-        profile_info = self.post(data)
+        profile_info = self.read(data)
         if profile_info:
             return profile_info.get("devList")
         else:
@@ -199,7 +451,7 @@ class Assistant(__AssistantCore):
             state_response = self.read_all_dev_state()
             
             if state_response:
-                _LOGGER.debug(f"Device states retrieved: {len(state_response) if state_response else 0} devices")
+                _LOGGER.debug("Device states retrieved: %d devices", len(state_response))
                 
                 # Filter devices by type
                 filtered_devices = []
@@ -216,7 +468,7 @@ class Assistant(__AssistantCore):
                 profile_response = self.read_all_dbus_devices()
                 
                 if profile_response:
-                    _LOGGER.debug(f"Device profiles retrieved: {len(profile_response) if profile_response else 0} devices")
+                    _LOGGER.debug("Device profiles retrieved: %d devices", len(profile_response))
                     
                     # Step 3: Merge state and profile information
                     merged_devices = {}
@@ -309,7 +561,43 @@ class Assistant(__AssistantCore):
     def ctrl_dev(self, data: dict):
         """Generic device control method matching JavaScript ctrlDev"""
         data["action"] = Action.CtrlDev.value
-        return self.do_action(data)
+        key = coalesce_key(data)
+        if key[2] == "switch":
+            return self._ctrl_superseding(key, data)
+        return self._ctrl_in_order(key, data)
+
+    def _ctrl_superseding(self, key, data: dict):
+        # 开关、位置类命令表达同一意图，新命令取代尚未发出的旧命令
+        deadline = Deadline(self.timeout * 2)
+        with self._commands_lock:
+            previous = self._commands.get(key)
+            self._commands[key] = deadline
+        if previous is not None:
+            previous.cancel()
+        try:
+            return self.do_action(data, deadline)
+        finally:
+            with self._commands_lock:
+                if self._commands.get(key) is deadline:
+                    del self._commands[key]
+
+    def _ctrl_in_order(self, key, data: dict):
+        # 字段类命令（温度、模式、风速）各自只带部分字段，不能互相取代，
+        # 同一通道按到达顺序逐个发送，后发的值最终生效
+        done = threading.Event()
+        with self._commands_lock:
+            previous = self._field_commands.get(key)
+            self._field_commands[key] = done
+        try:
+            if previous is not None:
+                # 前一个命令受自身 deadline 约束，等待有上限
+                previous.wait(self.timeout * 2)
+            return self.do_action(data, Deadline(self.timeout * 2))
+        finally:
+            done.set()
+            with self._commands_lock:
+                if self._field_commands.get(key) is done:
+                    del self._field_commands[key]
 
     def turn_to(self, dev_no, dev_ch, is_open: bool):
         cmd = Cmd.On if is_open else Cmd.Off
@@ -331,100 +619,41 @@ class Assistant(__AssistantCore):
         )
 
     def set_level(self, dev_no, dev_ch, level: int):
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.Level.value,
-                "level": level,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+        return self.ctrl_dev(COVER.encode(dev_no, dev_ch, level=level))
 
     def set_air_condition_power(self, dev_no, dev_ch, is_open: bool):
         power = Power.On if is_open else Power.Off
         return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirCondition.value,
-                "powerOn": power.value,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
+            AIR_CONDITION.encode(dev_no, dev_ch, power_on=power.value)
         )
 
     def set_air_condition_temperature(self, dev_no, dev_ch, temp: int):
-        _LOGGER.error(f"set_air_condition_temperature: {temp}")
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirCondition.value,
-                "temp": temp*100,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+        _CONTROL_LOGGER.debug("set_air_condition_temperature: %s", temp)
+        return self.ctrl_dev(AIR_CONDITION.encode(dev_no, dev_ch, temp=temp))
 
-    def set_air_condition_mode(self, dev_no, dev_ch, mode: int):
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirCondition.value,
-                "airMode": mode,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+    def set_air_condition_mode(self, dev_no, dev_ch, mode: str):
+        return self.ctrl_dev(AIR_CONDITION.encode(dev_no, dev_ch, air_mode=mode))
 
-    def set_air_condition_fan(self, dev_no, dev_ch, mode: int):
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirCondition.value,
-                "windSpeed": mode,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+    def set_air_condition_fan(self, dev_no, dev_ch, mode: str):
+        return self.ctrl_dev(AIR_CONDITION.encode(dev_no, dev_ch, wind_speed=mode))
 
 
     def set_floor_heating_power(self, dev_no, dev_ch, is_open: bool):
         power = Power.On if is_open else Power.Off
         return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirHeater.value,
-                "powerOn": power.value,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
+            FLOOR_HEATING.encode(dev_no, dev_ch, power_on=power.value)
         )
 
     def set_floor_heating_temperature(self, dev_no, dev_ch, temp: int):
-        _LOGGER.error(f"set_floor_heating_temperature: {temp}")
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirHeater.value,
-                "temp": temp*100,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+        _CONTROL_LOGGER.debug("set_floor_heating_temperature: %s", temp)
+        return self.ctrl_dev(FLOOR_HEATING.encode(dev_no, dev_ch, temp=temp))
 
     def set_air_fresh_power(self, dev_no, dev_ch, is_open: bool):
         power = Power.On if is_open else Power.Off
-        return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirFresh.value,
-                "powerOn": power.value,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
-        )
+        return self.ctrl_dev(AIR_FRESH.encode(dev_no, dev_ch, power_on=power.value))
 
-    def set_air_fresh_wind_speed(self, dev_no, dev_ch, wind_speed: int):
+    def set_air_fresh_wind_speed(self, dev_no, dev_ch, wind_speed: str):
         return self.ctrl_dev(
-            {
-                "cmd": Cmd.AirFresh.value,
-                "windSpeed": wind_speed,
-                "devNo": dev_no,
-                "devCh": dev_ch,
-            }
+            AIR_FRESH.encode(dev_no, dev_ch, wind_speed=wind_speed)
         )
 
-
-assistant = Assistant()
@@ -0,0 +1,64 @@
+"""
+Channel ownership for config entries sharing one gateway.
+
+An entry may be limited to part of the gateway with a channel filter, a
+comma separated list of ``devNo``, ``devNo-devNo`` ranges and single
+``devNo.devCh`` channels, e.g. ``"1-20, 33, 40.2"``. An empty filter takes
+every channel. A channel claimed by several entries belongs to the one
+that created its entity first, so no channel gets two entities.
+"""
+
+import re
+
+from .registry import KINDS
+
+_ITEM = re.compile(r"^(\d+)(?:-(\d+)|\.(\d+))?$")
+
+
+class ChannelFilter:
+    def __init__(self, text=""):
+        self._items = []
+        for item in re.split(r"[,\s]+", (text or "").strip()):
+            if not item:
+                continue
+            match = _ITEM.match(item)
+            if match is None:
+                raise ValueError(f"invalid channel item: {item}")
+            low, high, dev_ch = match.groups()
+            low = int(low)
+            high = int(high) if high else low
+            if high < low:
+                raise ValueError(f"invalid channel range: {item}")
+            self._items.append((low, high, int(dev_ch) if dev_ch else None))
+
+    @property
+    def everything(self):
+        return not self._items
+
+    def __contains__(self, key):
+        dev_no, dev_ch = key
+        if not self._items:
+            return True
+        return any(
+            low <= dev_no <= high and (ch is None or ch == dev_ch)
+            for low, high, ch in self._items
+        )
+
+    def __str__(self):
+        return ",".join(
+            f"{low}.{ch}" if ch is not None else (f"{low}" if low == high else f"{low}-{high}")
+            for low, high, ch in self._items
+        )
+
+
+class Subscription:
+    """The entities one config entry owns on a shared gateway"""
+
+    def __init__(self, entry_id, channels: ChannelFilter):
+        self.entry_id = entry_id
+        self.channels = channels
+        self.entities = {kind: [] for kind in KINDS}
+        # 各平台的 async_add_entities 回调，用于运行中增加实体
+        self.add_entities = {}
+        # 是否持有网关级诊断传感器
+        self.diagnostics = False
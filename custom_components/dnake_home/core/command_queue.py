@@ -0,0 +1,84 @@
+"""
+Bounded queue of ctrlDev commands held while the gateway is unreachable.
+
+Commands are coalesced per channel to the latest intent: the On/Off/stop/
+level commands of a channel replace each other, while field commands
+(AirCondition, AirHeater, AirFresh) are merged field by field with the
+newest value winning. Entries older than ``ttl`` seconds are dropped rather
+than replayed, so a gateway that comes back after an hour does not act on
+stale commands.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .constant import Cmd
+
+# 互相覆盖的命令：同一通道只保留最后一个
+_SWITCH_CMDS = {Cmd.On.value, Cmd.Off.value, Cmd.Stop.value, Cmd.Level.value}
+
+DEFAULT_MAX_COMMANDS = 64
+DEFAULT_COMMAND_TTL = 60
+# 离线期间探测网关是否恢复的间隔（秒），推送模式下轮询很少，不能依赖轮询发现恢复
+REPLAY_PROBE_INTERVAL = 5
+
+# 命令已入队待重放；为真值，调用方按成功处理（乐观更新状态）
+QUEUED = "queued"
+
+
+def coalesce_key(data: dict):
+    """Commands with the same key express one intent for one channel"""
+    cmd = data.get("cmd")
+    group = "switch" if cmd in _SWITCH_CMDS else cmd
+    return (data.get("devNo"), data.get("devCh"), group)
+
+
+class CommandQueue:
+    def __init__(self, max_size=DEFAULT_MAX_COMMANDS, ttl=DEFAULT_COMMAND_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._commands = OrderedDict()
+
+    def __len__(self):
+        return len(self._commands)
+
+    def put(self, data: dict, now=None):
+        now = time.monotonic() if now is None else now
+        command = {k: v for k, v in data.items() if k != "uuid"}
+        key = coalesce_key(command)
+        with self._lock:
+            queued = self._commands.pop(key, None)
+            if queued and key[2] != "switch":
+                command = {**queued[1], **command}
+            self._commands[key] = (now, command)
+            while len(self._commands) > self.max_size:
+                self._commands.popitem(last=False)
+                self.dropped += 1
+
+    def drain(self, now=None):
+        """Remove and return unexpired (queued_at, command) pairs in order"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            commands = [
+                (queued_at, command)
+                for queued_at, command in self._commands.values()
+                if now - queued_at <= self.ttl
+            ]
+            self.dropped += len(self._commands) - len(commands)
+            self._commands.clear()
+        return commands
+
+    def requeue(self, commands):
+        """Put back drained commands that could not be replayed"""
+        with self._lock:
+            newer = self._commands
+            self._commands = OrderedDict(
+                (coalesce_key(command), (queued_at, command))
+                for queued_at, command in commands
+            )
+        # 重放期间新入队的命令覆盖旧意图
+        for queued_at, command in newer.values():
+            self.put(command, queued_at)
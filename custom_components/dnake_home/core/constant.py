@@ -4,6 +4,54 @@ TITLE = "Dnake Home"
 DOMAIN = "dnake_home"
 MANUFACTURER = "Dnake"
 
+CONF_SCAN_INTERVAL = "scan_interval"
+CONF_CHANNELS = "channels"
+CONF_GW_IOT_NAME = "gw_iot_name"
+# 实体与设备标识是否带网关名前缀：接入第二个网关时新增的条目带前缀
+CONF_SCOPED_IDS = "scoped_ids"
+CONF_POLL_TIERS = "poll_tiers"
+CONF_TEMP_DEADBAND = "temp_deadband"
+CONF_TEMP_MIN_INTERVAL = "temp_min_interval"
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_MAX_INFLIGHT = "max_inflight"
+CONF_COVER_POLL_INTERVAL = "cover_poll_interval"
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_COMMAND_QUEUE = "command_queue"
+CONF_COMMAND_TTL = "command_ttl"
+CONF_PUSH_ENABLED = "push_enabled"
+CONF_PUSH_RECONCILE_INTERVAL = "push_reconcile_interval"
+
+DEFAULT_SCAN_INTERVAL = 10
+# 网关请求超时（秒）
+DEFAULT_REQUEST_TIMEOUT = 5
+# 同时发往网关的最大请求数
+DEFAULT_MAX_INFLIGHT = 4
+# 窗帘运动中刷新位置的间隔（毫秒）
+DEFAULT_COVER_POLL_INTERVAL = 500
+# 后台校验网关设备列表的间隔（秒）
+DEFAULT_DEVICE_SYNC_INTERVAL = 600
+# 收到推送期间，轮询降为低频全量校准的间隔（秒）
+DEFAULT_PUSH_RECONCILE_INTERVAL = 300
+# 超过该时长（秒）未收到推送，恢复正常轮询
+PUSH_QUIET_TIME = 60
+
+# 通道上报字段变化时触发的事件：每个变化的通道一个，每轮一个汇总
+EVENT_CHANNEL_CHANGED = "dnake_home_channel_changed"
+EVENT_CHANNELS_CHANGED = "dnake_home_channels_changed"
+
+# 网关流量录制文件（位于 HA 配置目录）
+TRAFFIC_RECORDING_FILE = "dnake_home_traffic.ndjson.gz"
+
+# 各类设备的轮询周期（scan_interval 的倍数）
+# 灯光、窗帘常被墙面开关改变，每个周期都刷新；温度类设备变化缓慢，低频刷新
+DEFAULT_POLL_TIERS = {
+    "light": 1,
+    "cover": 1,
+    "air_fresh": 3,
+    "climate": 6,
+    "floor_heating": 6,
+}
+
 
 class Action(Enum):
     # 获取单设备状态
@@ -0,0 +1,55 @@
+"""
+Deadlines for gateway operations.
+
+A ``Deadline`` is created by whoever starts a piece of work (a poll cycle,
+a cover level read, a command) and passed down to the transport. The
+transport checks it before queueing on the limiter, while waiting for a slot
+and before sending, and caps the request timeout to the time left. Work
+whose deadline has passed or that was cancelled by a newer operation is
+dropped instead of occupying the gateway or an executor thread.
+"""
+
+import threading
+import time
+
+
+class Cancelled(Exception):
+    """The operation was superseded or ran past its deadline"""
+
+
+class Deadline:
+    def __init__(self, timeout=None):
+        # None 表示只能被取消，不会超时
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        """Seconds left, None if there is no time limit"""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def done(self):
+        return self.cancelled or self.remaining() == 0
+
+    def wait(self, seconds):
+        """Sleep up to ``seconds``; returns True if the deadline ended meanwhile"""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._cancelled.wait(remaining)
+            return True
+        return self._cancelled.wait(seconds)
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled("cancelled")
+        if self.remaining() == 0:
+            raise Cancelled("deadline exceeded")
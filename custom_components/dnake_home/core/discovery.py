@@ -0,0 +1,147 @@
+"""
+Local gateway discovery and credential validation.
+
+Gateways are found by probing ``/smart/iot.info`` on every host of the local
+subnet(s) concurrently: probes run under a semaphore (bounded parallelism)
+and the whole scan under a deadline, so a /24 takes about one probe timeout
+instead of 254 of them.
+
+Many devices answer 401 on that path, so a host only counts once it returns
+an iot.info body (``gwIotName``) or its 401 names Dnake in the realm, Server
+header or body. Probes never send credentials; other gateways are entered by
+hand.
+"""
+
+import asyncio
+import ipaddress
+import logging
+
+import aiohttp
+
+from .utils import encode_auth
+
+_LOGGER = logging.getLogger(__name__)
+
+IOT_INFO_PATH = "/smart/iot.info"
+
+# 单个地址探测超时
+PROBE_TIMEOUT = 1.5
+# 整体扫描截止时间
+SCAN_DEADLINE = 8
+# 最大并发探测数
+MAX_PARALLEL_PROBES = 64
+# 超过 /24 的网段只扫描本机所在的 /24
+MIN_PREFIX = 24
+# 401 响应中表明是狄耐克设备的标记（小写）
+_MARKER = "dnake"
+
+
+class CannotConnect(Exception):
+    """The gateway did not answer"""
+
+
+class InvalidAuth(Exception):
+    """The gateway rejected the credentials"""
+
+
+def scan_hosts(networks):
+    """Yield candidate host addresses for the given (address, prefix) pairs"""
+    seen = set()
+    for address, prefix in networks:
+        ip = ipaddress.ip_address(address)
+        # 回环与链路本地地址上不会有网关
+        if ip.is_loopback or ip.is_link_local:
+            continue
+        prefix = max(prefix, MIN_PREFIX)
+        network = ipaddress.ip_network(f"{address}/{prefix}", strict=False)
+        for host in network.hosts():
+            host = str(host)
+            if host != address and host not in seen:
+                seen.add(host)
+                yield host
+
+
+async def _is_iot_info(resp: aiohttp.ClientResponse):
+    if resp.status != 200:
+        return False
+    info = await resp.json(content_type=None)
+    return isinstance(info, dict) and "gwIotName" in info
+
+
+async def _names_dnake(resp: aiohttp.ClientResponse):
+    text = " ".join(
+        (
+            resp.headers.get("WWW-Authenticate", ""),
+            resp.headers.get("Server", ""),
+            await resp.text(errors="replace"),
+        )
+    )
+    return _MARKER in text.lower()
+
+
+async def _probe(session: aiohttp.ClientSession, host, semaphore):
+    url = f"http://{host}{IOT_INFO_PATH}"
+    timeout = aiohttp.ClientTimeout(total=PROBE_TIMEOUT)
+    async with semaphore:
+        try:
+            async with session.get(url, timeout=timeout) as resp:
+                if resp.status != 401:
+                    return host if await _is_iot_info(resp) else None
+                # 路由器、NAS、摄像头等也会返回 401，不向它们发送任何账密
+                if await _names_dnake(resp):
+                    return host
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pass
+        return None
+
+
+async def async_discover_gateways(
+    session: aiohttp.ClientSession,
+    networks,
+    deadline=SCAN_DEADLINE,
+    parallel=MAX_PARALLEL_PROBES,
+):
+    """Return the sorted list of hosts answering like a Dnake gateway"""
+    semaphore = asyncio.Semaphore(parallel)
+    tasks = [
+        asyncio.ensure_future(_probe(session, host, semaphore))
+        for host in scan_hosts(networks)
+    ]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    found = [task.result() for task in done if task.result()]
+    _LOGGER.info(
+        "gateway discovery: probed %d hosts, found %s, %d unfinished",
+        len(tasks),
+        found,
+        len(pending),
+    )
+    return sorted(found, key=ipaddress.ip_address)
+
+
+async def async_validate_gateway(
+    session: aiohttp.ClientSession, host, auth_name, auth_psw
+):
+    """Fetch iot.info with the given credentials, raising on failure"""
+    try:
+        async with session.get(
+            f"http://{host}{IOT_INFO_PATH}",
+            headers={"Authorization": f"Basic {encode_auth(auth_name, auth_psw)}"},
+            timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT * 2),
+        ) as resp:
+            if resp.status in (401, 403):
+                raise InvalidAuth
+            resp.raise_for_status()
+            info = await resp.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        raise CannotConnect from e
+    if not isinstance(info, dict) or not info.get("gwIotName"):
+        raise CannotConnect
+    return {
+        "iot_device_name": info.get("devIotName"),
+        "gw_iot_name": info.get("gwIotName"),
+    }
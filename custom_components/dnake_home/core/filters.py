@@ -0,0 +1,63 @@
+import time
+
+# 最小间隔的容差比例：读数随轮询到达，间隔与轮询周期相同时会因定时与
+# 请求耗时的抖动一半概率略短于设定值，导致实际间隔翻倍
+_INTERVAL_TOLERANCE = 0.1
+
+
+class FilterSettings:
+    """
+    Shared tuning for a family of measurement filters.
+
+    Filters keep a reference to their settings rather than a copy, so
+    updating an instance retunes every entity using it without rebuilding.
+    """
+
+    def __init__(self, deadband=0.0, min_interval=0.0):
+        self.deadband = deadband
+        self.min_interval = min_interval
+
+
+class MeasurementFilter:
+    """
+    Deadband + minimum interval filter for a measured value.
+
+    A new value is published only if it differs from the last published one
+    by at least ``deadband`` and at least ``min_interval`` seconds (less a
+    10% tolerance for poll jitter) have passed since the last publish;
+    otherwise the last published value is kept.
+    """
+
+    __slots__ = ("settings", "_value", "_published_at")
+
+    def __init__(self, settings: FilterSettings):
+        self.settings = settings
+        self._value = None
+        self._published_at = 0.0
+
+    @property
+    def value(self):
+        return self._value
+
+    def update(self, value, now=None):
+        if value is None:
+            return self._value
+        if now is None:
+            now = time.monotonic()
+        if self._value is not None:
+            if abs(value - self._value) < self.settings.deadband:
+                return self._value
+            min_interval = self.settings.min_interval * (1 - _INTERVAL_TOLERANCE)
+            if now - self._published_at < min_interval:
+                return self._value
+        self._value = value
+        self._published_at = now
+        return value
+
+    def reset(self):
+        self._value = None
+        self._published_at = 0.0
+
+
+# 室内温度: 网关上报精度 0.01℃，过滤传感器抖动
+temperature_filter_settings = FilterSettings(deadband=0.1, min_interval=60)
@@ -0,0 +1,169 @@
+import threading
+import time
+
+# 等待并发名额时检查取消的间隔（秒）
+_CANCEL_POLL = 0.1
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of gateway requests in flight across executor threads.
+
+    Unlike ``threading.BoundedSemaphore`` the limit can be changed while
+    requests are running; lowering it simply makes new callers wait until
+    enough in-flight requests have finished.
+    """
+
+    def __init__(self, limit: int):
+        self._cond = threading.Condition()
+        self._limit = max(1, int(limit))
+        self._active = 0
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @property
+    def active(self):
+        return self._active
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self._limit = max(1, int(limit))
+            self._cond.notify_all()
+
+    def acquire(self, timeout=None, deadline=None) -> bool:
+        """
+        Wait for a free slot; gives up (returns False) after ``timeout`` or
+        once ``deadline`` is cancelled or expired.
+        """
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(timeout, remaining)
+        ends = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._active >= self._limit:
+                if deadline is not None and deadline.cancelled:
+                    return False
+                wait = None if ends is None else ends - time.monotonic()
+                if wait is not None and wait <= 0:
+                    return False
+                if deadline is not None:
+                    wait = _CANCEL_POLL if wait is None else min(wait, _CANCEL_POLL)
+                self._cond.wait(wait)
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdaptiveLimiter(ConcurrencyLimiter):
+    """
+    Concurrency and request-rate limit that follows gateway health (AIMD).
+
+    Each window of healthy responses (latency under ``latency_target``) adds
+    one to the in-flight limit and raises the rate by ``rate_step``, up to
+    their ceilings. A timeout, connection error or 5xx halves both at once,
+    so an overloaded gateway is backed off within a couple of requests and
+    recovers gradually.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        max_rate=20.0,
+        min_rate=0.5,
+        rate_step=1.0,
+        latency_target=1.0,
+    ):
+        super().__init__(max_limit)
+        self.max_limit = self.limit
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate_step = rate_step
+        self.latency_target = latency_target
+        self.rate = max_rate
+        self.latency = None
+        self.failures = 0
+        self._healthy = 0
+        self._state_lock = threading.Lock()
+        self._tokens = max_rate
+        self._last_refill = time.monotonic()
+
+    def set_max_limit(self, max_limit: int):
+        self.max_limit = max(1, int(max_limit))
+        if self.limit > self.max_limit:
+            self.set_limit(self.max_limit)
+
+    def _reserve_token(self):
+        """Token bucket; returns how long the caller must wait for its token"""
+        with self._state_lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._last_refill) * self.rate
+            )
+            self._last_refill = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _refund_token(self):
+        with self._state_lock:
+            self._tokens = min(self.rate, self._tokens + 1)
+
+    def acquire(self, timeout=None, deadline=None) -> bool:
+        wait = self._reserve_token()
+        if wait and deadline is None:
+            time.sleep(wait)
+        elif wait and deadline.wait(wait):
+            # 放弃的预约要归还，否则积压的欠账会让后续请求一直等待
+            self._refund_token()
+            return False
+        if super().acquire(timeout, deadline):
+            return True
+        self._refund_token()
+        return False
+
+    def on_success(self, latency):
+        with self._state_lock:
+            self.latency = latency if self.latency is None else self.latency * 0.8 + latency * 0.2
+            if latency > self.latency_target:
+                self._healthy = 0
+                return
+            self._healthy += 1
+            if self._healthy < self.limit:
+                return
+            self._healthy = 0
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+            grow = self.limit < self.max_limit
+        if grow:
+            self.set_limit(self.limit + 1)
+
+    def on_failure(self):
+        with self._state_lock:
+            self.failures += 1
+            self._healthy = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+        self.set_limit(self.limit // 2)
+
+    def diagnostics(self):
+        return {
+            "limit": self.limit,
+            "max_limit": self.max_limit,
+            "active": self.active,
+            "rate": round(self.rate, 2),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000),
+            "failures": self.failures,
+        }
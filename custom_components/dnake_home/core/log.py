@@ -0,0 +1,96 @@
+"""
+Logging helpers for the transport and poller hot paths.
+
+Each category is a child logger of the integration, so debug output can be
+switched on per category from Home Assistant's ``logger`` configuration::
+
+    logger:
+      logs:
+        custom_components.dnake_home.transport: debug
+        custom_components.dnake_home.poller: debug
+
+Messages always use lazy %-formatting; payloads are wrapped in ``Truncated``
+so they are only rendered (and clipped) when a record is actually emitted.
+"""
+
+import logging
+import threading
+import time
+
+LOGGER_ROOT = "custom_components.dnake_home"
+
+# 网关请求/响应
+TRANSPORT = "transport"
+# 定时轮询
+POLLER = "poller"
+# 设备控制
+CONTROL = "control"
+
+DEFAULT_MAX_PAYLOAD = 512
+
+
+def get_logger(category: str) -> logging.Logger:
+    return logging.getLogger(f"{LOGGER_ROOT}.{category}")
+
+
+class Truncated:
+    """Defers rendering of a payload and clips it to ``limit`` characters"""
+
+    __slots__ = ("_payload", "_limit")
+
+    def __init__(self, payload, limit=DEFAULT_MAX_PAYLOAD):
+        self._payload = payload
+        self._limit = limit
+
+    def __str__(self):
+        text = str(self._payload)
+        if len(text) <= self._limit:
+            return text
+        return f"{text[:self._limit]}...<{len(text) - self._limit} more chars>"
+
+    __repr__ = __str__
+
+
+class RateLimitedLogger:
+    """
+    Emits a given message key at most once per ``interval`` seconds.
+
+    Repeats inside the window are counted and reported with the next emitted
+    record for that key, so a gateway that is down for an hour produces a
+    handful of lines instead of one per poll.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 60):
+        self.logger = logger
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = {}
+        self._suppressed = {}
+
+    def log(self, level, key, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg = f"{msg} (suppressed %d similar messages)"
+            args = (*args, suppressed)
+        self.logger.log(level, msg, *args)
+
+    def warning(self, key, msg, *args):
+        self.log(logging.WARNING, key, msg, *args)
+
+    def error(self, key, msg, *args):
+        self.log(logging.ERROR, key, msg, *args)
+
+    def reset(self, key):
+        """Forget a key, e.g. once the failing operation has recovered"""
+        with self._lock:
+            self._last.pop(key, None)
+            self._suppressed.pop(key, None)
@@ -0,0 +1,83 @@
+def device_key(device: dict):
+    """(devNo, devCh) of a device.info entry, matching state record keys"""
+    gateway_info = device.get("gatewayDeviceInfo", {})
+    return (gateway_info.get("devNo"), gateway_info.get("devCh"))
+
+
+def diff_devices(old_list, new_list):
+    """
+    Compare two device.info lists.
+
+    Returns (added devices, removed devices); a channel whose devType
+    changed shows up in both.
+    """
+    old = {(device_key(d), d.get("devType")): d for d in old_list}
+    new = {(device_key(d), d.get("devType")): d for d in new_list}
+    added = [device for key, device in new.items() if key not in old]
+    removed = [device for key, device in old.items() if key not in new]
+    return added, removed
+
+
+def diff_reports(old: dict, new: dict):
+    """Raw report fields that differ: ({field: old value}, {field: new value})"""
+    changed = [field for field in new if old.get(field) != new[field]]
+    changed += [field for field in old if field not in new]
+    return (
+        {field: old.get(field) for field in changed},
+        {field: new.get(field) for field in changed},
+    )
+
+
+class GatewayModel:
+    """
+    In-memory model of one gateway: identity, device list and last states.
+
+    It outlives a config entry reload, so reloading with the same gateway
+    and credentials can rebuild entities from memory instead of repeating
+    the iot.info -> device.info -> full scan bootstrap.
+    """
+
+    def __init__(self, identity, iot_info: dict, device_list: list):
+        self.identity = identity
+        self.iot_info = iot_info
+        self.device_list = device_list
+        # (devNo, devCh) -> 最近一次读取到的状态记录
+        self.states = {}
+
+    def replace_devices(self, device_list, removed=()):
+        self.device_list = device_list
+        for device in removed:
+            self.states.pop(device_key(device), None)
+
+    def merge_states(self, indexed_states: dict):
+        """
+        Store new states and return the channels whose reports changed, as
+        compact records with the old and new values of the changed fields.
+        Channels seen for the first time have nothing to compare and are
+        not reported.
+        """
+        changes = []
+        states = self.states
+        for key, state in indexed_states.items():
+            previous = states.get(key)
+            if previous is None:
+                continue
+            old_reports = previous.get("reports") or {}
+            new_reports = state.get("reports") or {}
+            if old_reports == new_reports:
+                continue
+            old, new = diff_reports(old_reports, new_reports)
+            changes.append(
+                {
+                    "dev_no": key[0],
+                    "dev_ch": key[1],
+                    "dev_type": state.get("devType"),
+                    "old": old,
+                    "new": new,
+                }
+            )
+        states.update(indexed_states)
+        return changes
+
+    def cached_states(self):
+        return list(self.states.values())
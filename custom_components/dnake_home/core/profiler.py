@@ -0,0 +1,144 @@
+"""
+On-demand profiling of poll cycles.
+
+A ``CycleProfiler`` is attached to the poller for a fixed number of cycles
+and detached when done, so there is no cost while profiling is off. It
+collects either a deterministic profile (cProfile, event loop thread only)
+or a statistical one (stack samples of the loop thread), plus wall-clock
+totals for executor queue wait, gateway round trips and state dispatch.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+MODE_DETERMINISTIC = "deterministic"
+MODE_SAMPLING = "sampling"
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(name="dnake_home_profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.enabled = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.enabled.is_set():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = tuple(
+                f"{summary.name} ({summary.filename}:{summary.lineno})"
+                for summary in traceback.extract_stack(frame, limit=20)
+            )
+            self.samples[stack] += 1
+
+    def stop(self):
+        self._stopped.set()
+
+
+class CycleProfiler:
+    def __init__(self, cycles, mode=MODE_DETERMINISTIC, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.cycles = cycles
+        self.mode = mode
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._cycle_started = None
+        self.timings = Counter()
+        self.counts = Counter()
+        self.interval = interval
+        self._profile = cProfile.Profile() if mode == MODE_DETERMINISTIC else None
+        self._sampler = None
+        # 共享同一分析器的轮询器数，最后一个停止时结束采样线程
+        self._users = 0
+
+    @property
+    def done(self):
+        return self.completed >= self.cycles
+
+    def start(self):
+        """Start sampling the calling (event loop) thread, if in sampling mode"""
+        self._users += 1
+        if self.mode == MODE_SAMPLING and self._sampler is None:
+            self._sampler = _StackSampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop and join the sampler once the last user has stopped"""
+        self._users -= 1
+        if self._users > 0 or self._sampler is None:
+            return
+        self._sampler.stop()
+        self._sampler.join()
+
+    def begin_cycle(self):
+        self._cycle_started = time.perf_counter()
+        if self._profile:
+            self._profile.enable()
+        if self._sampler:
+            self._sampler.enabled.set()
+
+    def end_cycle(self):
+        """Close the current cycle; returns True once all cycles are done"""
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._sampler.enabled.clear()
+        if self._cycle_started is not None:
+            self.add("cycle", time.perf_counter() - self._cycle_started)
+            self._cycle_started = None
+        self.completed += 1
+        return self.done
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.timings[name] += seconds
+            self.counts[name] += 1
+
+    def wrap_executor_job(self, fn):
+        """Wrap an executor target to split queue wait from run time"""
+        submitted = time.perf_counter()
+
+        def _run(*args):
+            started = time.perf_counter()
+            self.add("executor_wait", started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                self.add("executor_run", time.perf_counter() - started)
+
+        return _run
+
+    def report(self, top=40):
+        out = io.StringIO()
+        out.write(f"mode: {self.mode}, cycles: {self.completed}\n\n")
+        out.write(f"{'phase':<16}{'calls':>8}{'total ms':>12}{'avg ms':>10}\n")
+        for name in sorted(self.timings):
+            total = self.timings[name] * 1000
+            count = self.counts[name]
+            out.write(f"{name:<16}{count:>8}{total:>12.1f}{total / count:>10.2f}\n")
+        out.write("\n")
+        # 未完成任何周期（如提前卸载）时没有可统计的数据
+        if self._profile and self.completed:
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        if self._sampler:
+            total = sum(self._sampler.samples.values())
+            out.write(f"samples: {total} every {self._sampler.interval * 1000:.1f} ms\n\n")
+            for stack, count in self._sampler.samples.most_common(top):
+                out.write(f"{count:>6} {count * 100 / max(1, total):5.1f}%  {stack[-1]}\n")
+                for frame in reversed(stack[:-1][-5:]):
+                    out.write(f"{'':>14}<- {frame}\n")
+        return out.getvalue()
@@ -0,0 +1,113 @@
+"""
+Gateway traffic recording and replay.
+
+``TrafficRecorder`` is attached to the assistant and writes every
+request/response pair seen at the ``get``/``post`` boundary, with its start
+offset and duration, as gzip-compressed NDJSON. ``ReplayAssistant`` serves a
+recording back through the same boundary so the rest of the stack runs
+unchanged against real production data, optionally N times faster.
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+from .assistant import Assistant
+
+
+def request_key(method, request):
+    """Stable key for a request, ignoring the per-request uuid"""
+    if isinstance(request, dict):
+        request = {k: v for k, v in request.items() if k != "uuid"}
+    return json.dumps([method, request], sort_keys=True, default=str)
+
+
+class TrafficRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._started = time.monotonic()
+        self.count = 0
+
+    def record(self, method, request, response, started, elapsed):
+        if isinstance(request, dict):
+            request = {k: v for k, v in request.items() if k != "uuid"}
+        line = json.dumps(
+            {
+                "t": round(started - self._started, 4),
+                "dt": round(elapsed, 4),
+                "m": method,
+                "req": request,
+                "resp": response,
+            },
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_recording(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayAssistant(Assistant):
+    """
+    Assistant whose transport answers from a recording.
+
+    Responses for the same request are served in recorded order; once a
+    request's recorded responses are used up the last one is repeated.
+    Recorded latency is reproduced divided by ``speed`` (0 disables it).
+    """
+
+    def __init__(self, records, speed=1.0):
+        super().__init__()
+        self.speed = speed
+        self.requests = 0
+        self.misses = 0
+        self._responses = defaultdict(deque)
+        self._last = {}
+        self._lock = threading.Lock()
+        for record in records:
+            key = request_key(record["m"], record["req"])
+            self._responses[key].append((record["dt"], record["resp"]))
+
+    @classmethod
+    def from_file(cls, path, speed=1.0):
+        return cls(load_recording(path), speed)
+
+    def _serve(self, method, request):
+        key = request_key(method, request)
+        with self._lock:
+            self.requests += 1
+            queue = self._responses.get(key)
+            if queue:
+                entry = self._last[key] = queue.popleft()
+            else:
+                entry = self._last.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+        elapsed, response = entry
+        if self.speed:
+            time.sleep(elapsed / self.speed)
+        return response
+
+    def get(self, path, deadline=None):
+        return self._serve("get", path)
+
+    def post(self, data: dict, deadline=None):
+        return self._serve("post", data)
@@ -0,0 +1,154 @@
+"""
+Declarative device type registry.
+
+Each Dnake devType is described once: the platform kind it belongs to, the
+report fields it exposes (with scaling and enum tables) and the command used
+to control it. Decoders and encoders are compiled from that description when
+the type is registered, so the polling hot loop only runs a flat tuple walk
+per record instead of chained dict lookups and linear reverse searches.
+"""
+
+from .constant import Cmd
+
+
+class EnumTable:
+    """Bidirectional map between HA values and raw gateway values"""
+
+    def __init__(self, mapping: dict, default=None):
+        self.to_raw = dict(mapping)
+        self.from_raw = {raw: key for key, raw in mapping.items()}
+        self.keys = tuple(mapping)
+        self.default = default
+
+    def encode(self, key):
+        return self.to_raw[key]
+
+    def decode(self, raw):
+        return self.from_raw.get(raw, self.default)
+
+
+class Field:
+    """A report field: raw gateway name -> decoded attribute"""
+
+    def __init__(self, raw, attr=None, default=None, scale=None, enum=None):
+        self.raw = raw
+        self.attr = attr or raw
+        self.default = default
+        self.scale = scale
+        self.enum = enum
+
+    def compile_decode(self):
+        raw, default, scale, enum = self.raw, self.default, self.scale, self.enum
+        if enum is not None:
+            return lambda reports: enum.decode(reports.get(raw, default))
+        if scale is not None:
+            return lambda reports: reports.get(raw, default) / scale
+        return lambda reports: reports.get(raw, default)
+
+    def encode(self, value):
+        if self.enum is not None:
+            return self.enum.encode(value)
+        if self.scale is not None:
+            return int(value * self.scale)
+        return value
+
+
+class DeviceType:
+    def __init__(self, dev_type: int, kind: str, model: str, cmd: Cmd, fields=()):
+        self.dev_type = dev_type
+        self.kind = kind
+        self.model = model
+        self.cmd = cmd
+        self.fields = {field.attr: field for field in fields}
+        self._decoders = tuple(
+            (field.attr, field.compile_decode()) for field in fields
+        )
+
+    def decode(self, reports: dict) -> dict:
+        """Decode a raw ``reports`` dict into {attr: value}"""
+        return {attr: decode(reports) for attr, decode in self._decoders}
+
+    def encode(self, dev_no, dev_ch, **values) -> dict:
+        """Build a ctrlDev payload from decoded attribute values"""
+        data = {"cmd": self.cmd.value, "devNo": dev_no, "devCh": dev_ch}
+        for attr, value in values.items():
+            field = self.fields[attr]
+            data[field.raw] = field.encode(value)
+        return data
+
+
+# 空调模式: HA hvac mode -> airMode
+HVAC_MODES = EnumTable(
+    {"off": 0, "heat": 4, "cool": 3, "fan_only": 7, "dry": 8}, default="off"
+)
+# 空调风速: HA fan mode -> windSpeed
+FAN_MODES = EnumTable({"low": 1, "middle": 2, "high": 3}, default="low")
+# 新风风速: speed name -> windSpeed
+AIR_FRESH_SPEEDS = EnumTable({"low": 1, "medium": 2, "high": 3})
+
+LIGHT = DeviceType(256, "light", "灯光控制", Cmd.On, (Field("state", default=0),))
+
+COVER = DeviceType(514, "cover", "窗帘控制", Cmd.Level, (Field("level", default=0),))
+
+AIR_CONDITION = DeviceType(
+    1536,
+    "climate",
+    "空调控制",
+    Cmd.AirCondition,
+    (
+        Field("temp", default=1600, scale=100),
+        Field("tempIndoor", "temp_indoor", default=1600, scale=100),
+        Field("powerOn", "power_on", default=0),
+        Field("airMode", "air_mode", enum=HVAC_MODES),
+        Field("windSpeed", "wind_speed", enum=FAN_MODES),
+    ),
+)
+
+AIR_FRESH = DeviceType(
+    1792,
+    "air_fresh",
+    "新风系统",
+    Cmd.AirFresh,
+    (
+        Field("powerOn", "power_on", default=0),
+        Field("windSpeed", "wind_speed", default=1, enum=AIR_FRESH_SPEEDS),
+    ),
+)
+
+FLOOR_HEATING = DeviceType(
+    2048,
+    "floor_heating",
+    "地暖控制",
+    Cmd.AirHeater,
+    (
+        Field("temp", default=1600, scale=100),
+        Field("tempIndoor", "temp_indoor", default=1600, scale=100),
+        Field("powerOn", "power_on", default=0),
+    ),
+)
+
+DEVICE_TYPES = {
+    device_type.dev_type: device_type
+    for device_type in (LIGHT, COVER, AIR_CONDITION, AIR_FRESH, FLOOR_HEATING)
+}
+
+KINDS = tuple(device_type.kind for device_type in DEVICE_TYPES.values())
+
+
+def get_device_type(dev_type):
+    return DEVICE_TYPES.get(dev_type)
+
+
+def classify_devices(device_list) -> dict:
+    """Group ``device.info`` entries by kind in a single pass"""
+    groups = {kind: [] for kind in KINDS}
+    for device in device_list:
+        device_type = DEVICE_TYPES.get(device.get("devType"))
+        if device_type:
+            groups[device_type.kind].append(device)
+    return groups
+
+
+def index_states(states) -> dict:
+    """Index ``read_all_dev_state`` records by (devNo, devCh)"""
+    return {(state.get("devNo"), state.get("devCh")): state for state in states or ()}
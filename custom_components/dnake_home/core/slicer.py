@@ -0,0 +1,97 @@
+"""
+Cooperative slicing of event loop work.
+
+Dispatching a poll to thousands of entities, or registering them, is plain
+synchronous code on the event loop. ``LoopSlicer`` lets dispatch yield back
+to the loop every ``slice_time`` seconds and caps the loop time one cycle
+may use, while recording the longest uninterrupted block it caused.
+``async_add_in_slices`` splits registration into batches instead.
+"""
+
+import asyncio
+import time
+
+# 单次连续占用事件循环的上限（秒）
+DEFAULT_SLICE_TIME = 0.01
+# 一轮状态分发可占用事件循环的总时长（秒），超出部分顺延到下一轮
+DEFAULT_CYCLE_BUDGET = 0.25
+# 注册实体时每批数量；HA 2024.3 上每批 100 个灯光约占用事件循环 70 ms
+DEFAULT_ADD_SLICE = 100
+
+
+class SliceCycle:
+    """The budget of one dispatch; dispatches may interleave on the loop"""
+
+    def __init__(self, slicer: "LoopSlicer"):
+        self._slicer = slicer
+        self._used = 0.0
+        self._slice_started = time.perf_counter()
+
+    def _close_slice(self):
+        block = time.perf_counter() - self._slice_started
+        self._used += block
+        if block > self._slicer.longest_block:
+            self._slicer.longest_block = block
+
+    async def checkpoint(self):
+        """Yield to the loop if the current slice has used up its time"""
+        if time.perf_counter() - self._slice_started < self._slicer.slice_time:
+            return
+        self._close_slice()
+        await asyncio.sleep(0)
+        self._slice_started = time.perf_counter()
+
+    @property
+    def exhausted(self):
+        running = time.perf_counter() - self._slice_started
+        return self._used + running >= self._slicer.cycle_budget
+
+    def end(self):
+        self._close_slice()
+        self._slicer.last_cycle = self._used
+
+
+class LoopSlicer:
+    def __init__(self, slice_time=DEFAULT_SLICE_TIME, cycle_budget=DEFAULT_CYCLE_BUDGET):
+        self.slice_time = slice_time
+        self.cycle_budget = cycle_budget
+        # 自上次读取以来最长的一次连续占用（秒）
+        self.longest_block = 0.0
+        # 上一轮占用事件循环的总时长（秒）
+        self.last_cycle = 0.0
+        # 因超出预算顺延的批次数
+        self.deferred = 0
+
+    def begin(self) -> SliceCycle:
+        """Start the budget of one dispatch"""
+        return SliceCycle(self)
+
+    def take_longest_block(self):
+        """Longest block since the previous call, then start a new window"""
+        longest, self.longest_block = self.longest_block, 0.0
+        return longest
+
+    def diagnostics(self):
+        return {
+            "slice_ms": round(self.slice_time * 1000, 1),
+            "cycle_budget_ms": round(self.cycle_budget * 1000, 1),
+            "last_cycle_ms": round(self.last_cycle * 1000, 1),
+            "deferred": self.deferred,
+        }
+
+
+async def async_add_in_slices(async_add_entities, entities, size=DEFAULT_ADD_SLICE):
+    """
+    Hand entities to the platform in batches, yielding between them.
+
+    Home Assistant registers each ``async_add_entities`` call in a task of
+    its own, so this does not wait for registration to finish. It bounds
+    how much of it runs without a break: a batch's task runs before this
+    resumes, so one uninterrupted block registers at most ``size`` entities.
+    """
+    for start in range(0, len(entities), size):
+        async_add_entities(entities[start : start + size])
+        await asyncio.sleep(0)
+
+
+loop_slicer = LoopSlicer()
@@ -0,0 +1,101 @@
+"""
+Travel-time model for covers.
+
+Dnake covers report a level of 0 - 254 but only when polled. Once a cover's
+full-travel time has been observed for a direction, its position during a
+motion can be estimated from elapsed time alone, and the gateway only needs
+to be asked once the motion should be over.
+"""
+
+import time
+
+MAX_LEVEL = 254
+
+# 学习所需的最小行程，行程太短时电机启停时间占比过大
+MIN_LEARN_TRAVEL = 64
+# 新观测值的权重
+LEARN_WEIGHT = 0.3
+# 合理的全行程时间范围（秒）
+MIN_FULL_TRAVEL = 2
+MAX_FULL_TRAVEL = 300
+
+
+class TravelModel:
+    def __init__(self, open_time=None, close_time=None):
+        # 从全关到全开 / 从全开到全关所需时间（秒），None 表示尚未校准
+        self.open_time = open_time
+        self.close_time = close_time
+        self._from_level = None
+        self._to_level = None
+        self._started = None
+
+    def as_dict(self):
+        return {"open_time": self.open_time, "close_time": self.close_time}
+
+    def _full_time(self, opening):
+        return self.open_time if opening else self.close_time
+
+    def is_calibrated(self, from_level, to_level):
+        return self._full_time(to_level > from_level) is not None
+
+    @property
+    def moving(self):
+        return self._started is not None
+
+    def start(self, from_level, to_level, now=None):
+        self._from_level = from_level
+        self._to_level = to_level
+        self._started = time.monotonic() if now is None else now
+
+    def elapsed(self, now=None):
+        if self._started is None:
+            return 0.0
+        return (time.monotonic() if now is None else now) - self._started
+
+    def duration(self):
+        """Expected duration of the current motion, None if uncalibrated"""
+        if self._started is None:
+            return None
+        full_time = self._full_time(self._to_level > self._from_level)
+        if full_time is None:
+            return None
+        return full_time * abs(self._to_level - self._from_level) / MAX_LEVEL
+
+    def position(self, now=None):
+        """Estimated level of the current motion, None if uncalibrated"""
+        duration = self.duration()
+        if duration is None:
+            return None
+        if duration <= 0:
+            return self._to_level
+        progress = min(1.0, self.elapsed(now) / duration)
+        return round(self._from_level + (self._to_level - self._from_level) * progress)
+
+    def finish(self, reached_level=None, now=None):
+        """
+        End the current motion; if ``reached_level`` is the target it was
+        observed arriving now, which is used to refine the travel time.
+        Returns True if the model learned from this motion.
+        """
+        learned = False
+        if self._started is not None and reached_level == self._to_level:
+            learned = self.learn(self._from_level, self._to_level, self.elapsed(now))
+        self._from_level = self._to_level = self._started = None
+        return learned
+
+    def learn(self, from_level, to_level, elapsed):
+        travel = abs(to_level - from_level)
+        if travel < MIN_LEARN_TRAVEL or elapsed <= 0:
+            return False
+        full_time = elapsed * MAX_LEVEL / travel
+        if not MIN_FULL_TRAVEL <= full_time <= MAX_FULL_TRAVEL:
+            return False
+        opening = to_level > from_level
+        previous = self._full_time(opening)
+        if previous is not None:
+            full_time = previous + (full_time - previous) * LEARN_WEIGHT
+        if opening:
+            self.open_time = full_time
+        else:
+            self.close_time = full_time
+        return True
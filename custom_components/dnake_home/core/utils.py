@@ -9,7 +9,3 @@ def encode_auth(auth_name, auth_psw):
 
 def get_uuid():
     return str(uuid.uuid4())
-
-
-def get_key_by_value(data: dict, test, default_value):
-    return next((key for key, value in data.items() if value == test), default_value)
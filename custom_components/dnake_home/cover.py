@@ -1,30 +1,61 @@
 import logging
 from datetime import timedelta
+from functools import partial
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.components.cover import CoverEntity, CoverEntityFeature
 from homeassistant.helpers.entity_platform import AddEntitiesCallback, async_call_later
 from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.storage import Store
 
-from .core.assistant import assistant
+from .core.command_queue import QUEUED
 from .core.constant import DOMAIN, MANUFACTURER
+from .core.deadline import Deadline
+from .core.registry import COVER
+from .core.slicer import async_add_in_slices
+from .core.travel import MAX_FULL_TRAVEL, TravelModel
 
 _LOGGER = logging.getLogger(__name__)
 
+# 已校准窗帘本地估算位置的刷新间隔
+_ESTIMATE_INTERVAL = timedelta(seconds=1)
+# 预计到位后延迟确认的余量
+_CONFIRM_MARGIN = timedelta(seconds=1)
+# 运动中轮询位置的上限（秒），超过后不再等待到位，交回定时轮询
+_MOTION_TIMEOUT = MAX_FULL_TRAVEL
 
-def load_covers(device_list):
-    covers = [DnakeCover(device) for device in device_list if device.get("devType") == 514]
+_travel_store = None
+# unique_id -> 已学习的行程时间
+_travel_data = {}
+
+
+def load_covers(hub, device_list):
+    covers = [DnakeCover(hub, device) for device in device_list]
     _LOGGER.info(f"find cover num: {len(covers)}")
-    assistant.entries["cover"] = covers
+    return covers
 
 
-def update_covers_state(states):
-    covers = assistant.entries["cover"]
-    for cover in covers:
-        if cover.is_opening or cover.is_closing:
-            return
-        state = next((state for state in states if cover.is_hint_state(state)), None)
+async def _async_load_travel(hass: HomeAssistant):
+    global _travel_store
+    if _travel_store is None:
+        _travel_store = Store(hass, 1, f"{DOMAIN}.cover_travel")
+        _travel_data.update(await _travel_store.async_load() or {})
+
+
+def _save_travel(cover):
+    _travel_data[cover.unique_id] = cover.travel.as_dict()
+    if _travel_store:
+        _travel_store.async_delay_save(lambda: dict(_travel_data), 10)
+
+
+def update_covers_state(states, entities):
+    if not states:
+        return
+    for cover in entities:
+        if cover.in_motion:
+            continue
+        state = states.get(cover.state_key)
         if state:
             cover.update_state(state)
 
@@ -34,46 +65,51 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ):
-    cover_list = assistant.entries["cover"]
+    subscription = hass.data[DOMAIN][entry.entry_id].subscriptions[entry.entry_id]
+    subscription.add_entities["cover"] = async_add_entities
+    await _async_load_travel(hass)
+    cover_list = subscription.entities["cover"]
     if cover_list:
-        async_add_entities(cover_list)
+        await async_add_in_slices(async_add_entities, cover_list)
 
 
 class DnakeCover(CoverEntity):
 
-    def __init__(self, device):
-        self._name = device.get("devName")
+    _attr_should_poll = False
+    _attr_supported_features = (
+        CoverEntityFeature.OPEN
+        | CoverEntityFeature.CLOSE
+        | CoverEntityFeature.STOP
+        | CoverEntityFeature.SET_POSITION
+    )
+
+    def __init__(self, hub, device):
+        name = device.get("devName")
         gateway_info = device.get("gatewayDeviceInfo", {})
         self._dev_no = gateway_info.get("devNo")
         self._dev_ch = gateway_info.get("devCh")
+        self.state_key = (self._dev_no, self._dev_ch)
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = hub.scoped(f"dnake_{self._dev_ch}_{self._dev_no}")
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, hub.scoped(f"cover_{self._dev_ch}_{self._dev_no}"))},
+            name=name,
+            manufacturer=MANUFACTURER,
+            model=COVER.model,
+            via_device=(DOMAIN, hub.scoped("gateway")),
+        )
         self._target_level = 0
         self._current_level = 0
         self._level_refresher_cancel = None
+        self._confirm_cancel = None
+        self._reload_cancel = None
+        # 进行中的位置读取，有新命令时取消
+        self._read_deadline = None
+        self.travel = TravelModel()
 
-    def is_hint_state(self, state):
-        return state.get("devNo") == self._dev_no and state.get("devCh") == self._dev_ch
-
-    @property
-    def unique_id(self):
-        return f"dnake_{self._dev_ch}_{self._dev_no}"
-
-    @property
-    def device_info(self):
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"cover_{self._dev_ch}_{self._dev_no}")},
-            name=self._name,
-            manufacturer=MANUFACTURER,
-            model="窗帘控制",
-            via_device=(DOMAIN, "gateway"),
-        )
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def name(self):
-        return self._name
+    async def async_added_to_hass(self):
+        self.travel = TravelModel(**_travel_data.get(self.unique_id, {}))
 
     @property
     def is_closed(self):
@@ -87,20 +123,20 @@ class DnakeCover(CoverEntity):
     def is_closing(self):
         return self._target_level < self._current_level
 
+    @property
+    def in_motion(self):
+        """
+        True until the motion is confirmed over; the estimated level may
+        already equal the target while the cover is still moving.
+        """
+        # 运动中由实体自己的位置读取与到位确认更新状态，轮询不能覆盖
+        return self.travel.moving or self.is_opening or self.is_closing
+
     @property
     def current_cover_position(self):
         # 0 - 254 for dnake cover
         return int((self._current_level / 254) * 100)
 
-    @property
-    def supported_features(self):
-        return (
-            CoverEntityFeature.OPEN
-            | CoverEntityFeature.CLOSE
-            | CoverEntityFeature.STOP
-            | CoverEntityFeature.SET_POSITION
-        )
-
     async def async_close_cover(self, **kwargs):
         await self.async_set_cover_position(position=0)
 
@@ -109,61 +145,170 @@ class DnakeCover(CoverEntity):
 
     async def async_set_cover_position(self, **kwargs):
         target_level = int((kwargs.get("position", 0) / 100) * 254)
+        self._cancel_read()
         is_success = await self.hass.async_add_executor_job(
-            assistant.set_level,
+            self._hub.assistant.set_level,
             self._dev_no,
             self._dev_ch,
             target_level,
         )
-        if is_success:
+        if is_success == QUEUED:
+            # 网关离线，命令待重放：窗帘尚未运动，不估算也不轮询
+            _LOGGER.info("gateway offline, cover position command queued")
+        elif is_success:
             self._target_level = target_level
+            self.travel.start(self._current_level, target_level)
             self._start_schedule_update()
         else:
             _LOGGER.error("set cover position fail")
 
     async def async_stop_cover(self, **kwargs):
+        self._cancel_read()
         is_success = await self.hass.async_add_executor_job(
-            assistant.stop,
+            self._hub.assistant.stop,
             self._dev_no,
             self._dev_ch,
         )
-        if is_success:
+        if is_success == QUEUED:
+            _LOGGER.info("gateway offline, cover stop command queued")
+        elif is_success:
             self._stop_schedule_update()
+            # 按行程模型估算停止位置，随后的延迟读取再做校准
+            estimated = self.travel.position()
+            self.travel.finish()
+            if estimated is not None:
+                self._current_level = self._target_level = estimated
+                self.async_write_ha_state()
 
             # 停止后，延迟获取level状态才准确
             async def _reload_cover(_):
+                self._reload_cancel = None
                 await self._async_refresh_level()
 
-            async_call_later(self.hass, timedelta(seconds=2), _reload_cover)
+            self._cancel_reload()
+            self._reload_cancel = async_call_later(
+                self.hass, timedelta(seconds=2), _reload_cover
+            )
 
     def _start_schedule_update(self):
         self._stop_schedule_update()
+        duration = self.travel.duration()
+        if duration is None:
+            # 未校准：运动中轮询网关位置，同时学习行程时间
+            self._start_polling()
+            return
+        # 已校准：本地估算位置，预计到位后向网关确认一次
+        self._level_refresher_cancel = async_track_time_interval(
+            self.hass,
+            self._do_estimate_update,
+            _ESTIMATE_INTERVAL,
+        )
+        self._confirm_cancel = async_call_later(
+            self.hass,
+            timedelta(seconds=duration) + _CONFIRM_MARGIN,
+            self._do_confirm,
+        )
+
+    def _start_polling(self):
         self._level_refresher_cancel = async_track_time_interval(
             self.hass,
             self._do_schedule_update,
-            timedelta(milliseconds=500),
+            self._hub.cover_poll_interval,
         )
 
+    async def _do_estimate_update(self, now=None):
+        estimated = self.travel.position()
+        if estimated is None:
+            return
+        self._current_level = estimated
+        self.async_write_ha_state()
+        if estimated == self._target_level and self._level_refresher_cancel:
+            self._level_refresher_cancel()
+            self._level_refresher_cancel = None
+
+    async def _do_confirm(self, now=None):
+        self._confirm_cancel = None
+        if self._level_refresher_cancel:
+            self._level_refresher_cancel()
+            self._level_refresher_cancel = None
+        refreshed = await self._async_refresh_level(update_target_level=False)
+        if refreshed is None:
+            return
+        if refreshed and self._current_level == self._target_level:
+            self.travel.finish()
+        else:
+            # 读取失败或估算偏快，退回轮询直到到位，并据此修正行程时间
+            self._start_polling()
+
     async def _do_schedule_update(self, now=None):
-        await self._async_refresh_level(update_target_level=False)
-        if self._current_level == self._target_level:
+        if self._read_deadline:
+            # 上一次读取还没返回，不叠加请求
+            return
+        refreshed = await self._async_refresh_level(update_target_level=False)
+        if refreshed is None:
+            return
+        if refreshed and self._current_level == self._target_level:
+            self._stop_schedule_update()
+            if self.travel.finish(self._current_level):
+                _save_travel(self)
+        elif self.travel.elapsed() > _MOTION_TIMEOUT:
+            # 网关一直不可达或窗帘受阻，放弃等待，以最后读到的位置为准
+            _LOGGER.warning("cover did not reach target level, stop tracking motion")
             self._stop_schedule_update()
+            self.travel.finish()
+            self._target_level = self._current_level
+            self.async_write_ha_state()
 
     def _stop_schedule_update(self):
         if self._level_refresher_cancel:
             self._level_refresher_cancel()
+            self._level_refresher_cancel = None
+        if self._confirm_cancel:
+            self._confirm_cancel()
+            self._confirm_cancel = None
+
+    def _cancel_read(self):
+        if self._read_deadline:
+            self._read_deadline.cancel()
+            self._read_deadline = None
+
+    def _cancel_reload(self):
+        if self._reload_cancel:
+            self._reload_cancel()
+            self._reload_cancel = None
+
+    async def async_will_remove_from_hass(self):
+        self._stop_schedule_update()
+        self._cancel_reload()
+        self._cancel_read()
 
     async def _async_refresh_level(self, update_target_level=True):
+        """
+        Read and apply the level. Returns True if applied, False if the read
+        failed and None if a newer read or command superseded it.
+        """
+        # 上一次读取尚未返回时直接取代
+        self._cancel_read()
+        deadline = self._read_deadline = Deadline(self._hub.assistant.timeout * 2)
         state = await self.hass.async_add_executor_job(
-            assistant.read_dev_state,
-            self._dev_no,
-            self._dev_ch,
+            partial(
+                self._hub.assistant.read_dev_state,
+                self._dev_no,
+                self._dev_ch,
+                deadline=deadline,
+            )
         )
-        if state and state.get("result") == "ok":
-            self.update_state(state, update_target_level=update_target_level)
+        if deadline.cancelled:
+            return None
+        self._read_deadline = None
+        if not state or state.get("result") != "ok":
+            return False
+        self.update_state(state, update_target_level=update_target_level)
+        return True
 
     def update_state(self, state, update_target_level=True):
-        current_level = state.get("level", 0)
+        # 全量读取的状态在 reports 中，单设备读取的状态在顶层
+        current_level = COVER.decode(state.get("reports", state))["level"]
         self._current_level = current_level
         if update_target_level:
             self._target_level = current_level
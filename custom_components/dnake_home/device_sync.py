@@ -0,0 +1,81 @@
+import logging
+from datetime import timedelta
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_time_interval
+
+from .core.constant import DEFAULT_DEVICE_SYNC_INTERVAL
+from .core.model import diff_devices
+from .hub import GatewayHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DeviceSync:
+    """
+    Periodically re-reads device.info and applies only the difference.
+
+    New channels get entities in the entry owning them, through the
+    platform's stored ``async_add_entities`` callback; vanished channels have
+    their entity removed from HA and the entity registry, and their device
+    from the device registry. Every other
+    entity, and its state, is left alone.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub: GatewayHub,
+        interval=DEFAULT_DEVICE_SYNC_INTERVAL,
+    ):
+        self.hass = hass
+        self.hub = hub
+        self.model = hub.model
+        self.interval = interval
+        self._cancel_interval = None
+
+    async def async_sync(self, now=None):
+        device_list = await self.hass.async_add_executor_job(
+            self.hub.assistant.query_device_list
+        )
+        if not device_list:
+            return
+        added, removed = diff_devices(self.model.device_list, device_list)
+        if not added and not removed:
+            return
+        _LOGGER.info("device list changed: %d added, %d removed", len(added), len(removed))
+        self.model.replace_devices(device_list, removed)
+        for device in removed:
+            await self._async_remove_device(device)
+        added_kinds = self.hub.add_devices(added)
+        if added_kinds:
+            await self.hub.poller.async_refresh(added_kinds)
+
+    async def _async_remove_device(self, device):
+        entity = self.hub.remove_device(device)
+        if entity is None:
+            return
+        if entity.registry_entry:
+            # 从实体注册表删除，实体会随之从 HA 中移除
+            er.async_get(self.hass).async_remove(entity.entity_id)
+        else:
+            await entity.async_remove()
+        # 每个通道对应一个设备，通道消失后设备也一并删除
+        device_registry = dr.async_get(self.hass)
+        device = device_registry.async_get_device(
+            identifiers=entity.device_info["identifiers"]
+        )
+        if device is not None:
+            device_registry.async_remove_device(device.id)
+
+    def start(self):
+        self.stop()
+        self._cancel_interval = async_track_time_interval(
+            self.hass, self.async_sync, timedelta(seconds=self.interval)
+        )
+
+    def stop(self):
+        if self._cancel_interval:
+            self._cancel_interval()
+            self._cancel_interval = None
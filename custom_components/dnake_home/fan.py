@@ -3,7 +3,8 @@ from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .core.assistant import assistant
+from .core.constant import DOMAIN
+from .core.slicer import async_add_in_slices
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -13,6 +14,8 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ):
-    air_fresh_list = assistant.entries.get("air_fresh", [])
+    subscription = hass.data[DOMAIN][entry.entry_id].subscriptions[entry.entry_id]
+    subscription.add_entities["air_fresh"] = async_add_entities
+    air_fresh_list = subscription.entities["air_fresh"]
     if air_fresh_list:
-        async_add_entities(air_fresh_list)
\ No newline at end of file
+        await async_add_in_slices(async_add_entities, air_fresh_list)
\ No newline at end of file
@@ -7,33 +7,30 @@ from homeassistant.components.climate.const import (
     HVACMode,
 )
 
-from .core.assistant import assistant
+from .core.filters import MeasurementFilter
 from .core.constant import DOMAIN, MANUFACTURER
+from .core.registry import FLOOR_HEATING
 
 _LOGGER = logging.getLogger(__name__)
 
-_hvac_table = {
-    HVACMode.OFF: 0,
-    HVACMode.HEAT: 1,
-}
+_hvac_modes = [HVACMode.OFF, HVACMode.HEAT]
 
 _min_temperature = 16
 
 _max_temperature = 32
 
 
-def load_floor_heatings(device_list):
-    climates = [
-        DnakeFloorHeating(device) for device in device_list if device.get("devType") == 2048
-    ]
+def load_floor_heatings(hub, device_list):
+    climates = [DnakeFloorHeating(hub, device) for device in device_list]
     _LOGGER.info(f"find floor heating num: {len(climates)}")
-    assistant.entries["floor_heating"] = climates
+    return climates
 
 
-def update_floor_heatings_state(states):
-    floor_heatings = assistant.entries["floor_heating"]
-    for floor_heating in floor_heatings:
-        state = next((state for state in states if floor_heating.is_hint_state(state)), None)
+def update_floor_heatings_state(states, entities):
+    if not states:
+        return
+    for floor_heating in entities:
+        state = states.get(floor_heating.state_key)
         if state:
             floor_heating.update_state(state)
 
@@ -41,39 +38,38 @@ def update_floor_heatings_state(states):
 
 class DnakeFloorHeating(ClimateEntity):
 
-    def __init__(self, device):
-        self._name = device.get("devName")
+    _attr_should_poll = False
+    _attr_hvac_modes = _hvac_modes
+    _attr_min_temp = _min_temperature
+    _attr_max_temp = _max_temperature
+    _attr_target_temperature_step = 1
+    _attr_temperature_unit = UnitOfTemperature.CELSIUS
+    _attr_supported_features = ClimateEntityFeature.TARGET_TEMPERATURE
+
+    def __init__(self, hub, device):
+        name = device.get("devName")
         gateway_info = device.get("gatewayDeviceInfo", {})
         self._dev_no = gateway_info.get("devNo")
         self._dev_ch = gateway_info.get("devCh")
+        self.state_key = (self._dev_no, self._dev_ch)
+        self._hub = hub
+        self._attr_name = name
+        self._attr_unique_id = hub.scoped(
+            f"dnake_floor_heating_{self._dev_ch}_{self._dev_no}"
+        )
+        self._attr_device_info = DeviceInfo(
+            identifiers={
+                (DOMAIN, hub.scoped(f"floor_heating_{self._dev_ch}_{self._dev_no}"))
+            },
+            name=name,
+            manufacturer=MANUFACTURER,
+            model=FLOOR_HEATING.model,
+            via_device=(DOMAIN, hub.scoped("gateway")),
+        )
         self._target_temperature = _min_temperature
         self._current_temperature = _min_temperature
         self._hvac_mode = HVACMode.OFF
-
-    def is_hint_state(self, state):
-        return state.get("devNo") == self._dev_no and state.get("devCh") == self._dev_ch
-
-    @property
-    def unique_id(self):
-        return f"dnake_floor_heating_{self._dev_ch}_{self._dev_no}"
-
-    @property
-    def device_info(self):
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"floor_heating_{self._dev_ch}_{self._dev_no}")},
-            name=self._name,
-            manufacturer=MANUFACTURER,
-            model="地暖控制",
-            via_device=(DOMAIN, "gateway"),
-        )
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def name(self):
-        return self._name
+        self._temperature_filter = MeasurementFilter(hub.temperature_filter)
 
     @property
     def target_temperature(self):
@@ -83,38 +79,13 @@ class DnakeFloorHeating(ClimateEntity):
     def current_temperature(self):
         return self._current_temperature
 
-    @property
-    def min_temp(self):
-        return _min_temperature
-
-    @property
-    def max_temp(self):
-        return _max_temperature
-
-    @property
-    def target_temperature_step(self):
-        return 1
-
     @property
     def hvac_mode(self):
         return self._hvac_mode
 
-    @property
-    def hvac_modes(self):
-        return list(_hvac_table.keys())
-
-
-    @property
-    def temperature_unit(self):
-        return UnitOfTemperature.CELSIUS
-
-    @property
-    def supported_features(self):
-        return ClimateEntityFeature.TARGET_TEMPERATURE
-
     async def _async_turn_to(self, is_open: bool):
         return await self.hass.async_add_executor_job(
-            assistant.set_floor_heating_power,
+            self._hub.assistant.set_floor_heating_power,
             self._dev_no,
             self._dev_ch,
             is_open,
@@ -123,7 +94,7 @@ class DnakeFloorHeating(ClimateEntity):
     async def async_set_temperature(self, **kwargs):
         temperature = kwargs.get("temperature")
         is_success = await self.hass.async_add_executor_job(
-            assistant.set_floor_heating_temperature,
+            self._hub.assistant.set_floor_heating_temperature,
             self._dev_no,
             self._dev_ch,
             temperature,
@@ -147,10 +118,23 @@ class DnakeFloorHeating(ClimateEntity):
 
 
     def update_state(self, state):
-        self._target_temperature = state.get("reports", {}).get("temp", _min_temperature)/100
-        self._current_temperature = state.get("reports", {}).get("tempIndoor", _min_temperature)/100
-        if state.get("reports", {}).get("powerOn", 0) == 0:
-            self._hvac_mode = HVACMode.OFF
-        else:
-            self._hvac_mode = HVACMode.HEAT
+        values = FLOOR_HEATING.decode(state.get("reports", {}))
+        new_state = (
+            values["temp"],
+            self._temperature_filter.update(values["temp_indoor"]),
+            HVACMode.OFF if values["power_on"] == 0 else HVACMode.HEAT,
+        )
+        old_state = (
+            self._target_temperature,
+            self._current_temperature,
+            self._hvac_mode,
+        )
+        # 室内温度抖动被过滤后状态未变化，不写入 HA
+        if new_state == old_state:
+            return
+        (
+            self._target_temperature,
+            self._current_temperature,
+            self._hvac_mode,
+        ) = new_state
         self.async_write_ha_state()
@@ -0,0 +1,229 @@
+import logging
+from datetime import timedelta
+from homeassistant.core import HomeAssistant
+
+from .core.assistant import Assistant
+from .core.channels import ChannelFilter, Subscription
+from .core.constant import DEFAULT_COVER_POLL_INTERVAL
+from .core.filters import FilterSettings, temperature_filter_settings
+from .core.model import GatewayModel, device_key
+from .core.registry import DEVICE_TYPES, KINDS
+from .air_fresh import load_air_fresh_devices
+from .climate import load_climates
+from .cover import load_covers
+from .floor_heating import load_floor_heatings
+from .light import load_lights
+from .poller import DnakePoller
+from .sensor import gateway_sensors
+
+_LOGGER = logging.getLogger(__name__)
+
+_LOADERS = {
+    "light": load_lights,
+    "cover": load_covers,
+    "climate": load_climates,
+    "floor_heating": load_floor_heatings,
+    "air_fresh": load_air_fresh_devices,
+}
+
+# gw_iot_name -> GatewayHub
+_hubs = {}
+
+
+def find_hub(gw_iot_name=None, gateway_ip=None):
+    """Hub for a gateway by IoT identity, or by address for entries without one"""
+    if gw_iot_name in _hubs:
+        return _hubs[gw_iot_name]
+    for hub in _hubs.values():
+        if gateway_ip is not None and hub.gateway_ip == gateway_ip:
+            return hub
+    return None
+
+
+def loaded_hubs():
+    return list(_hubs.values())
+
+
+class GatewayHub:
+    """
+    One transport, model, poller and device sync per physical gateway.
+
+    Config entries pointing at the same gateway subscribe to it with a
+    channel filter and get entities only for the channels they own; the
+    gateway is scanned once for all of them. A channel belongs to the entry
+    holding its entity; when that entry unloads, its channels (and the
+    gateway sensors) are handed over to the other entries.
+
+    Gateway-level options (transport, poll and filter tuning, recording)
+    come from one owning entry: the entry that set the hub up, then the
+    oldest remaining one once it unloads. Other entries only bring their
+    channels and push endpoint.
+
+    Unique ids and device identifiers of a hub with a ``namespace`` are
+    prefixed with it, so several gateways can be loaded side by side; the
+    gateway set up first keeps unprefixed ids (see ``CONF_SCOPED_IDS``).
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        key,
+        gateway_ip,
+        model: GatewayModel,
+        assistant: Assistant,
+        namespace="",
+    ):
+        self.hass = hass
+        self.key = key
+        self.gateway_ip = gateway_ip
+        self.model = model
+        self.assistant = assistant
+        self.namespace = namespace
+        self.poller = None
+        self.device_sync = None
+        # 提供网关级选项的条目
+        self.owner = None
+        # 室内温度过滤参数，本网关的空调与地暖实体共用
+        self.temperature_filter = FilterSettings(
+            temperature_filter_settings.deadband, temperature_filter_settings.min_interval
+        )
+        # 窗帘运动中刷新位置的间隔
+        self.cover_poll_interval = timedelta(milliseconds=DEFAULT_COVER_POLL_INTERVAL)
+        # entry_id -> Subscription，各配置条目拥有的实体与平台回调
+        self.subscriptions = {}
+        # 所有订阅的实体（按类型汇总），供轮询分发
+        self.entries = {kind: [] for kind in KINDS}
+        # (devNo, devCh) -> 持有该通道实体的 entry_id
+        self._owners = {}
+
+    def register(self):
+        _hubs[self.key] = self
+
+    def scoped(self, name):
+        """Unique id or device identifier ``name`` on this gateway"""
+        return f"{self.namespace}/{name}" if self.namespace else name
+
+    def _subscriber(self, key, candidates=None):
+        """Entry that should get a channel nobody holds yet"""
+        if key in self._owners:
+            return None
+        for subscription in candidates or self.subscriptions.values():
+            if key in subscription.channels:
+                return subscription
+        return None
+
+    def _rebuild_entries(self):
+        self.entries = {
+            kind: [
+                entity
+                for subscription in self.subscriptions.values()
+                for entity in subscription.entities[kind]
+            ]
+            for kind in KINDS
+        }
+
+    def _claim(self, devices, candidates=None):
+        """Create entities for unheld channels in the entries that should own them"""
+        claimed = {}
+        for device in devices:
+            device_type = DEVICE_TYPES.get(device.get("devType"))
+            key = device_key(device)
+            owner = self._subscriber(key, candidates)
+            if device_type is None or owner is None:
+                continue
+            self._owners[key] = owner.entry_id
+            claimed.setdefault((owner, device_type.kind), []).append(device)
+        for (owner, kind), group in claimed.items():
+            entities = _LOADERS[kind](self, group)
+            owner.entities[kind].extend(entities)
+            add_entities = owner.add_entities.get(kind)
+            if add_entities:
+                add_entities(entities)
+        self._rebuild_entries()
+        return list({kind for _, kind in claimed})
+
+    def subscribe(self, entry_id, channels: ChannelFilter) -> Subscription:
+        subscription = Subscription(entry_id, channels)
+        self.subscriptions[entry_id] = subscription
+        if self.owner is None:
+            self.owner = entry_id
+        # 已被其他条目持有的通道不再重复创建实体
+        self._claim(
+            [device for device in self.model.device_list if device_key(device) in channels],
+            [subscription],
+        )
+        if not any(subscription.entities.values()):
+            _LOGGER.warning("entry %s owns no channels on gateway %s", entry_id, self.key)
+        return subscription
+
+    def unsubscribe(self, entry_id):
+        """Drop an entry's entities and return its subscription for hand_over"""
+        subscription = self.subscriptions.pop(entry_id, None)
+        if self.owner == entry_id:
+            # 网关级选项改由最早加载的其余条目提供
+            self.owner = next(iter(self.subscriptions), None)
+        self._owners = {
+            key: owner for key, owner in self._owners.items() if owner != entry_id
+        }
+        self._rebuild_entries()
+        return subscription
+
+    @property
+    def idle(self):
+        return not self.subscriptions
+
+    def hand_over(self, released: Subscription):
+        """
+        Give the channels and gateway sensors of an unloaded entry to the
+        remaining entries; call once its platforms are unloaded so the
+        unique ids are free again. Returns the kinds that got new entities.
+        """
+        keys = {
+            entity.state_key
+            for entities in released.entities.values()
+            for entity in entities
+        }
+        kinds = self._claim(
+            [device for device in self.model.device_list if device_key(device) in keys]
+        )
+        if released.diagnostics:
+            for subscription in self.subscriptions.values():
+                add_entities = subscription.add_entities.get("sensor")
+                if add_entities:
+                    subscription.diagnostics = True
+                    add_entities(gateway_sensors(self))
+                    break
+        return kinds
+
+    def add_devices(self, devices):
+        """Create entities for new channels in the entries owning them"""
+        return self._claim(devices)
+
+    def remove_device(self, device):
+        """Detach the entity of a vanished channel and return it"""
+        device_type = DEVICE_TYPES.get(device.get("devType"))
+        if device_type is None:
+            return None
+        key = device_key(device)
+        subscription = self.subscriptions.get(self._owners.pop(key, None))
+        if subscription is None:
+            return None
+        entities = subscription.entities[device_type.kind]
+        entity = next((e for e in entities if e.state_key == key), None)
+        if entity is not None:
+            entities.remove(entity)
+            self._rebuild_entries()
+        return entity
+
+    def start(self, poller: DnakePoller, device_sync):
+        self.poller = poller
+        self.device_sync = device_sync
+        poller.start()
+        device_sync.start()
+
+    def stop(self):
+        if self.device_sync:
+            self.device_sync.stop()
+        if self.poller:
+            self.poller.stop()
+        _hubs.pop(self.key, None)
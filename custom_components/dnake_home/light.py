@@ -7,24 +7,25 @@ from homeassistant.components.light import (
     ColorMode,
 )
 from homeassistant.helpers.entity import DeviceInfo
-from .core.assistant import assistant
 from .core.constant import DOMAIN, MANUFACTURER
+from .core.registry import LIGHT
+from .core.slicer import async_add_in_slices
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def load_lights(device_list):
-    lights = [DnakeLight(device) for device in device_list if device.get("devType") == 256]
-    assistant.entries["light"] = lights
+def load_lights(hub, device_list):
+    lights = [DnakeLight(hub, device) for device in device_list]
+    _LOGGER.info(f"find light num: {len(lights)}")
+    return lights
 
 
-def update_lights_state(states):
-    lights = assistant.entries["light"]
+def update_lights_state(states, entities):
     if not states:
         return
-    for light in lights:
-        state = next((state for state in states if light.is_hint_state(state)), None)
+    for light in entities:
+        state = states.get(light.state_key)
         if state:
             light.update_state(state)
 
@@ -34,57 +35,42 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ):
-    light_list = assistant.entries["light"]
+    subscription = hass.data[DOMAIN][entry.entry_id].subscriptions[entry.entry_id]
+    subscription.add_entities["light"] = async_add_entities
+    light_list = subscription.entities["light"]
     if light_list:
-        async_add_entities(light_list)
+        await async_add_in_slices(async_add_entities, light_list)
 
 
 class DnakeLight(LightEntity):
 
-    def __init__(self, device):
-        self._name = device.get("devName")
+    _attr_should_poll = False
+    _attr_color_mode = ColorMode.ONOFF
+    _attr_supported_color_modes = {ColorMode.ONOFF}
+
+    def __init__(self, hub, device):
+        name = device.get("devName")
         gateway_info = device.get("gatewayDeviceInfo", {})
         self._dev_no = gateway_info.get("devNo")
         self._dev_ch = gateway_info.get("devCh")
+        self.state_key = (self._dev_no, self._dev_ch)
+        self._hub = hub
         self._is_on = False
-
-    def is_hint_state(self, state):
-        return state.get("devNo") == self._dev_no and state.get("devCh") == self._dev_ch
-
-    @property
-    def unique_id(self):
-        return f"dnake_{self._dev_ch}_{self._dev_no}"
-
-    @property
-    def device_info(self):
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"light_{self._dev_ch}_{self._dev_no}")},
-            name=self._name,
+        # 元数据只在创建时计算一次，状态写入时直接读取
+        self._attr_name = name
+        self._attr_unique_id = hub.scoped(f"dnake_{self._dev_ch}_{self._dev_no}")
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, hub.scoped(f"light_{self._dev_ch}_{self._dev_no}"))},
+            name=name,
             manufacturer=MANUFACTURER,
-            model="灯光控制",
-            via_device=(DOMAIN, "gateway"),
+            model=LIGHT.model,
+            via_device=(DOMAIN, hub.scoped("gateway")),
         )
 
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def name(self):
-        return self._name
-
     @property
     def is_on(self):
         return self._is_on
 
-    @property
-    def color_mode(self):
-        return ColorMode.ONOFF
-
-    @property
-    def supported_color_modes(self):
-        return {ColorMode.ONOFF}
-
     async def async_turn_on(self, **kwargs):
         await self._turn_to(True)
 
@@ -93,7 +79,7 @@ class DnakeLight(LightEntity):
 
     async def _turn_to(self, is_on):
         is_success = await self.hass.async_add_executor_job(
-            assistant.turn_to,
+            self._hub.assistant.turn_to,
             self._dev_no,
             self._dev_ch,
             is_on,
@@ -103,5 +89,6 @@ class DnakeLight(LightEntity):
             self.async_write_ha_state()
 
     def update_state(self, state):
-        self._is_on = state.get("reports", {}).get("state", 0) == 1
+        values = LIGHT.decode(state.get("reports", {}))
+        self._is_on = values["state"] == 1
         self.async_write_ha_state()
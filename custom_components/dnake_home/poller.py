@@ -0,0 +1,305 @@
+import asyncio
+import time
+from datetime import timedelta
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_track_time_interval
+
+from .core.constant import (
+    DEFAULT_POLL_TIERS,
+    DEFAULT_PUSH_RECONCILE_INTERVAL,
+    EVENT_CHANNEL_CHANGED,
+    EVENT_CHANNELS_CHANGED,
+    PUSH_QUIET_TIME,
+)
+from .core.deadline import Deadline
+from .core.log import POLLER, get_logger
+from .core.profiler import CycleProfiler
+from .core.registry import DEVICE_TYPES, index_states
+from .core.slicer import loop_slicer
+from .cover import update_covers_state
+from .light import update_lights_state
+from .climate import update_climates_state
+from .floor_heating import update_floor_heatings_state
+from .air_fresh import update_air_fresh_state
+
+_LOGGER = get_logger(POLLER)
+
+_KIND_DEV_TYPES = {
+    device_type.kind: device_type.dev_type for device_type in DEVICE_TYPES.values()
+}
+
+_UPDATERS = {
+    "light": update_lights_state,
+    "cover": update_covers_state,
+    "climate": update_climates_state,
+    "floor_heating": update_floor_heatings_state,
+    "air_fresh": update_air_fresh_state,
+}
+
+# 分片分发时每批处理的实体数
+_DISPATCH_CHUNK = 50
+
+
+class DnakePoller:
+    """
+    Refreshes device state in tiers.
+
+    Every tick is ``scan_interval`` seconds; a device kind with tier ``n`` is
+    refreshed every ``n`` ticks. A tick issues at most one read: scoped to
+    the devType when a single kind is due, so slow kinds (temperatures) cost
+    nothing on most ticks, and full-scope otherwise. A gateway that answers
+    a scoped read with other devTypes ignores the filter, so the poller
+    falls back to full reads for good.
+
+    Each tick's reads carry a deadline of one interval; a refresh still
+    running when the next tick fires is cancelled rather than left to
+    compete with the new one.
+
+    While states are being pushed (see ``async_push``) ticks are skipped
+    except for a full reconciliation every ``reconcile_interval`` seconds.
+
+    Channels whose raw reports changed are announced on the event bus
+    before entities are updated: one ``EVENT_CHANNEL_CHANGED`` per channel
+    and one ``EVENT_CHANNELS_CHANGED`` with every change of the cycle.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub,
+        scan_interval,
+        tiers=None,
+        reconcile_interval=DEFAULT_PUSH_RECONCILE_INTERVAL,
+    ):
+        self.hass = hass
+        self.hub = hub
+        self.model = hub.model
+        self.assistant = hub.assistant
+        self.scan_interval = scan_interval
+        self.tiers = {**DEFAULT_POLL_TIERS, **(tiers or {})}
+        self.reconcile_interval = reconcile_interval
+        self._last_push = None
+        self._last_reconcile = 0.0
+        self._tick = 0
+        self._cancel_interval = None
+        self._refresh_task = None
+        self._deadline = None
+        self.profiler = None
+        self._profile_done = None
+        # 超出预算未分发的批次，按来源（轮询/推送）分别记录，下次先分发
+        self._deferred = {}
+        # 网关忽略 devType 过滤时改为全量读取
+        self._scoped_reads = True
+
+    def _dispatch_chunks(self):
+        chunks = []
+        for kind, update in _UPDATERS.items():
+            entities = self.hub.entries[kind]
+            for start in range(0, len(entities), _DISPATCH_CHUNK):
+                chunks.append((update, kind, start))
+        return chunks
+
+    def _fire_changes(self, changes):
+        gateway = self.model.iot_info.get("gw_iot_name")
+        fire = self.hass.bus.async_fire
+        for change in changes:
+            fire(EVENT_CHANNEL_CHANGED, {"gateway": gateway, **change})
+
+    def _fire_batch(self, changes):
+        if changes:
+            self.hass.bus.async_fire(
+                EVENT_CHANNELS_CHANGED,
+                {"gateway": self.model.iot_info.get("gw_iot_name"), "changes": changes},
+            )
+
+    async def async_dispatch(self, states, source="poll"):
+        """
+        Route states to entities in slices that yield to the event loop.
+        Chunks left over once the cycle budget is spent are skipped and
+        dispatched first on the next dispatch from the same ``source``,
+        from the model's states since that read may not cover their kind;
+        the model gets every state. Returns the channel changes found in
+        ``states``.
+        """
+        if not states:
+            return []
+        started = time.perf_counter()
+        cycle = loop_slicer.begin()
+        indexed = index_states(states)
+        changes = self.model.merge_states(indexed)
+        self._fire_changes(changes)
+        chunks = self._dispatch_chunks()
+        deferred = self._deferred.pop(source, set()) & set(chunks)
+        chunks = [chunk for chunk in chunks if chunk in deferred] + [
+            chunk for chunk in chunks if chunk not in deferred
+        ]
+        total = len(chunks)
+        for done in range(total):
+            if done and cycle.exhausted:
+                self._deferred[source] = set(chunks[done:])
+                loop_slicer.deferred += total - done
+                _LOGGER.debug(
+                    "dispatch budget spent, %d of %d chunks deferred", total - done, total
+                )
+                break
+            chunk = chunks[done]
+            update, kind, start = chunk
+            # 刚创建、尚未由平台加入 hass 的实体不能写状态，跳过
+            entities = [
+                entity
+                for entity in self.hub.entries[kind][start : start + _DISPATCH_CHUNK]
+                if entity.hass is not None
+            ]
+            update(self.model.states if chunk in deferred else indexed, entities)
+            await cycle.checkpoint()
+        cycle.end()
+        if self.profiler:
+            self.profiler.add("dispatch", time.perf_counter() - started)
+        return changes
+
+    async def _async_executor(self, fn, *args):
+        if self.profiler:
+            fn = self.profiler.wrap_executor_job(fn)
+        return await self.hass.async_add_executor_job(fn, *args)
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    async def async_profile(self, profiler: CycleProfiler):
+        """Profile the next ``profiler.cycles`` ticks, then detach"""
+        if self.profiling:
+            raise HomeAssistantError("a profile is already running")
+        self._profile_done = asyncio.Event()
+        self.profiler = profiler
+        self.assistant.profiler = profiler
+        profiler.start()
+        try:
+            await self._profile_done.wait()
+        finally:
+            self.profiler = None
+            self.assistant.profiler = None
+            # 轮询提前停止时也要结束采样线程
+            profiler.stop()
+
+    async def async_restore_cached_states(self):
+        """Push the model's last known states to freshly created entities"""
+        if not self.model.states:
+            return False
+        await self.async_dispatch(self.model.cached_states())
+        return True
+
+    def _loaded_kinds(self):
+        return [kind for kind in _KIND_DEV_TYPES if self.hub.entries[kind]]
+
+    def _due_kinds(self, kinds):
+        return [kind for kind in kinds if self._tick % max(1, self.tiers.get(kind, 1)) == 0]
+
+    async def async_refresh(self, kinds=None, deadline: Deadline = None):
+        """Refresh the given kinds (default: everything) and dispatch states"""
+        loaded = self._loaded_kinds()
+        kinds = loaded if kinds is None else [kind for kind in kinds if kind in loaded]
+        if not kinds:
+            return
+        # 每轮最多一次读取：仅一类到期时按 devType 读取，否则全量读取
+        dev_type = None
+        if len(kinds) == 1 and len(loaded) > 1 and self._scoped_reads:
+            dev_type = _KIND_DEV_TYPES[kinds[0]]
+            _LOGGER.debug("update %s state", kinds[0])
+        else:
+            _LOGGER.debug("update all device state")
+        states = await self._async_executor(
+            self.assistant.read_all_dev_state, 0, dev_type, deadline
+        )
+        if dev_type is not None and any(
+            state.get("devType") != dev_type for state in states or ()
+        ):
+            _LOGGER.info("gateway ignores the devType filter, using full reads")
+            self._scoped_reads = False
+        if deadline is None or not deadline.cancelled:
+            self._fire_batch(await self.async_dispatch(states))
+
+    async def _async_supersede(self):
+        """Cancel a refresh still running from the previous tick"""
+        previous = self._refresh_task
+        if previous is None or previous.done():
+            return
+        _LOGGER.debug("previous refresh still running, cancelling it")
+        if self._deadline:
+            self._deadline.cancel()
+        previous.cancel()
+        await asyncio.wait([previous])
+
+    @property
+    def push_active(self):
+        return (
+            self._last_push is not None
+            and time.monotonic() - self._last_push < PUSH_QUIET_TIME
+        )
+
+    async def async_push(self, states):
+        """Dispatch states reported by an external bridge"""
+        if not self.push_active:
+            _LOGGER.info("receiving pushed states, polling every %ss", self.reconcile_interval)
+            self._last_reconcile = time.monotonic()
+        self._last_push = time.monotonic()
+        self._fire_batch(await self.async_dispatch(states, "push"))
+
+    async def _async_tick(self, now=None):
+        reconcile = self.push_active
+        if reconcile:
+            # 推送期间只做低频全量校准
+            if time.monotonic() - self._last_reconcile < self.reconcile_interval:
+                return
+            self._last_reconcile = time.monotonic()
+        elif self._last_push is not None:
+            _LOGGER.info("no pushed states for %ss, resuming polling", PUSH_QUIET_TIME)
+            self._last_push = None
+        await self._async_supersede()
+        self._tick += 1
+        task = self._refresh_task = asyncio.current_task()
+        deadline = self._deadline = Deadline(self.scan_interval)
+        kinds = None if reconcile else self._due_kinds(self._loaded_kinds())
+        profiler = self.profiler
+        if profiler:
+            profiler.begin_cycle()
+        try:
+            await self.async_refresh(kinds, deadline)
+        finally:
+            if self._refresh_task is task:
+                self._refresh_task = None
+                self._deadline = None
+            if profiler and profiler.end_cycle():
+                self._profile_done.set()
+
+    def configure(self, scan_interval=None, tiers=None, reconcile_interval=None):
+        """Retune a running poller without recreating entities"""
+        if tiers is not None:
+            self.tiers = {**DEFAULT_POLL_TIERS, **tiers}
+        if reconcile_interval is not None:
+            self.reconcile_interval = reconcile_interval
+        if scan_interval is not None and scan_interval != self.scan_interval:
+            self.scan_interval = scan_interval
+            if self._cancel_interval:
+                self.start()
+
+    def start(self):
+        self.stop()
+        self._cancel_interval = async_track_time_interval(
+            self.hass, self._async_tick, timedelta(seconds=self.scan_interval)
+        )
+
+    def stop(self):
+        if self._cancel_interval:
+            self._cancel_interval()
+            self._cancel_interval = None
+        # 卸载时不再等待进行中的刷新
+        if self._deadline:
+            self._deadline.cancel()
+            self._deadline = None
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
+        if self._profile_done:
+            self._profile_done.set()
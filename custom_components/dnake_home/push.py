@@ -0,0 +1,91 @@
+import logging
+
+from aiohttp import web
+from homeassistant.components import webhook
+from homeassistant.core import HomeAssistant
+
+from .core.constant import DOMAIN, TITLE
+from .poller import DnakePoller
+
+_LOGGER = logging.getLogger(__name__)
+
+# 单次推送最多接受的记录数
+MAX_PUSH_RECORDS = 5000
+
+# entry_id -> webhook_id
+_registered = {}
+# 已在日志中提示过地址的 webhook_id，重载时不重复提示
+_announced = set()
+
+
+def _valid_record(record):
+    return (
+        isinstance(record, dict)
+        and isinstance(record.get("devNo"), int)
+        and isinstance(record.get("devCh"), int)
+        and isinstance(record.get("reports"), dict)
+    )
+
+
+def parse_records(payload):
+    """
+    Accept a list of state records, a readDev-style ``{"devList": [...]}``
+    body or a single record; returns (valid records, rejected count).
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("devList", [payload])
+    if not isinstance(payload, list):
+        return [], 1
+    records = [
+        {
+            "devNo": record["devNo"],
+            "devCh": record["devCh"],
+            "devType": record.get("devType"),
+            "reports": record["reports"],
+        }
+        for record in payload[:MAX_PUSH_RECORDS]
+        if _valid_record(record)
+    ]
+    return records, len(payload) - len(records)
+
+
+def async_setup_push(hass: HomeAssistant, entry_id, webhook_id, poller: DnakePoller):
+    """Register the local-only push webhook feeding ``poller``"""
+    if _registered.get(entry_id) == webhook_id:
+        return
+    async_unload_push(hass, entry_id)
+
+    async def _async_handle(hass: HomeAssistant, webhook_id, request: web.Request):
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="invalid json")
+        records, rejected = parse_records(payload)
+        if rejected:
+            _LOGGER.debug("push: %d malformed records ignored", rejected)
+        if records:
+            await poller.async_push(records)
+        return web.json_response({"accepted": len(records), "rejected": rejected})
+
+    webhook.async_register(
+        hass,
+        DOMAIN,
+        f"{TITLE} push",
+        webhook_id,
+        _async_handle,
+        local_only=True,
+        allowed_methods=["POST"],
+    )
+    _registered[entry_id] = webhook_id
+    if webhook_id not in _announced:
+        # 默认日志级别下也要能看到，外部推送方需要这个地址
+        _announced.add(webhook_id)
+        _LOGGER.warning(
+            "push endpoint enabled: POST %s", webhook.async_generate_path(webhook_id)
+        )
+
+
+def async_unload_push(hass: HomeAssistant, entry_id):
+    webhook_id = _registered.pop(entry_id, None)
+    if webhook_id:
+        webhook.async_unregister(hass, webhook_id)
@@ -0,0 +1,87 @@
+import logging
+from datetime import timedelta
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .core.constant import DOMAIN, MANUFACTURER
+from .core.slicer import loop_slicer
+
+_LOGGER = logging.getLogger(__name__)
+
+# 仅读取本地限流器与事件循环统计，不访问网关
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+):
+    hub = hass.data[DOMAIN][entry.entry_id]
+    subscription = hub.subscriptions[entry.entry_id]
+    subscription.add_entities["sensor"] = async_add_entities
+    # 网关级诊断传感器只由一个条目持有，该条目卸载时转交给其他条目
+    if any(s.diagnostics for s in hub.subscriptions.values()):
+        return
+    subscription.diagnostics = True
+    async_add_entities(gateway_sensors(hub))
+
+
+def gateway_sensors(hub):
+    return [DnakeRequestLimitSensor(hub), DnakeLoopBlockSensor(hub)]
+
+
+def _gateway_device_info(hub):
+    return DeviceInfo(
+        identifiers={(DOMAIN, hub.scoped("gateway"))},
+        name=f"Dnake Gateway {hub.namespace}" if hub.namespace else "Dnake Gateway",
+        manufacturer=MANUFACTURER,
+        model="智能家居网关",
+    )
+
+
+class DnakeRequestLimitSensor(SensorEntity):
+    """Current adaptive in-flight request limit toward the gateway"""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:speedometer"
+
+    _attr_name = "Dnake Gateway Request Limit"
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._attr_unique_id = hub.scoped("dnake_gateway_request_limit")
+        self._attr_device_info = _gateway_device_info(hub)
+
+    @property
+    def native_value(self):
+        return self._hub.assistant.limiter.limit
+
+    @property
+    def extra_state_attributes(self):
+        return self._hub.assistant.limiter.diagnostics()
+
+
+class DnakeLoopBlockSensor(SensorEntity):
+    """Longest event loop block caused by state dispatch since the last update"""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-sand"
+
+    _attr_name = "Dnake Longest Loop Block"
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._attr_unique_id = hub.scoped("dnake_gateway_loop_block")
+        self._attr_device_info = _gateway_device_info(hub)
+
+    async def async_update(self):
+        self._attr_native_value = round(loop_slicer.take_longest_block() * 1000, 1)
+        self._attr_extra_state_attributes = loop_slicer.diagnostics()
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .core.constant import DOMAIN
+from .core.profiler import MODE_DETERMINISTIC, MODE_SAMPLING, CycleProfiler
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE = "profile"
+# async_setup_services 注册的全部服务，最后一个网关卸载时一并移除
+_SERVICES = (SERVICE_PROFILE,)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("cycles", default=5): vol.All(int, vol.Range(min=1, max=1000)),
+        vol.Optional("mode", default=MODE_DETERMINISTIC): vol.In(
+            [MODE_DETERMINISTIC, MODE_SAMPLING]
+        ),
+    }
+)
+
+
+def _write_report(path, report):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(report)
+
+
+def async_setup_services(hass: HomeAssistant):
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+
+    async def _async_profile(call: ServiceCall):
+        # 共享同一网关的条目对应同一个网关 hub 与轮询器
+        hubs = {id(hub): hub for hub in hass.data.get(DOMAIN, {}).values()}
+        pollers = [hub.poller for hub in hubs.values() if hub.poller]
+        if not pollers:
+            raise HomeAssistantError("dnake_home is not loaded")
+        # 进行中的分析会被新的分析器替换而无法结束，直接拒绝
+        if any(poller.profiling for poller in pollers):
+            raise HomeAssistantError("a profile is already running")
+        profiler = CycleProfiler(call.data["cycles"], call.data["mode"])
+
+        async def _async_run():
+            await asyncio.gather(*(poller.async_profile(profiler) for poller in pollers))
+            path = hass.config.path(
+                f"dnake_home_profile_{dt_util.now():%Y%m%d_%H%M%S}.txt"
+            )
+            await hass.async_add_executor_job(_write_report, path, profiler.report())
+            _LOGGER.warning("profile report written to %s", path)
+
+        # 分析持续 N 个轮询周期，不阻塞服务调用方
+        hass.async_create_task(_async_run())
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, _async_profile, schema=PROFILE_SCHEMA
+    )
+
+
+def async_unload_services(hass: HomeAssistant):
+    for service in _SERVICES:
+        hass.services.async_remove(DOMAIN, service)
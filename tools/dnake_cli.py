@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Standalone command line tool for a Dnake gateway.
+
+Uses the integration's core (assistant, registry) without Home Assistant:
+
+    python tools/dnake_cli.py --host 192.168.1.2 dump --what state --format ndjson
+    python tools/dnake_cli.py --host 192.168.1.2 bulk commands.ndjson -c 4
+    python tools/dnake_cli.py --host 192.168.1.2 poll --cycles 20 --interval 1
+
+Bulk command files hold one JSON object per line, either a raw ctrlDev
+payload ({"devNo": 1, "devCh": 2, "cmd": "On"}) or decoded values for a
+devType ({"devType": 1536, "devNo": 3, "devCh": 1, "temp": 24}). Every line
+is sent: lines for the same channel go out one at a time in file order,
+different channels run concurrently.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "custom_components", "dnake_home"),
+)
+
+from core.assistant import Assistant  # noqa: E402
+from core.constant import Action  # noqa: E402
+from core.registry import get_device_type  # noqa: E402
+
+
+def _emit(records, fmt, out=sys.stdout):
+    if fmt == "ndjson":
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        json.dump(records, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+
+
+async def _connect(args):
+    client = Assistant()
+    client.bind_auth_info(args.host, args.user, args.password)
+    client.configure(timeout=args.timeout, max_inflight=args.concurrency)
+    iot_info = await asyncio.to_thread(client.query_iot_info)
+    if not iot_info:
+        raise SystemExit(f"cannot reach gateway {args.host}")
+    client.bind_iot_info(iot_info["iot_device_name"], iot_info["gw_iot_name"])
+    return client
+
+
+async def _read_pages(client, fields, concurrency):
+    first = await asyncio.to_thread(client.read_dev_page, fields, 0)
+    if not first or first.get("result") != "ok":
+        raise SystemExit(f"readDev {fields} failed: {first}")
+    total_page = int(first.get("totalPage", 1) or 1)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _page(index):
+        async with semaphore:
+            return await asyncio.to_thread(client.read_dev_page, fields, index)
+
+    rest = await asyncio.gather(*(_page(index) for index in range(1, total_page)))
+    records = list(first.get("devList", []))
+    for index, page in enumerate(rest, start=1):
+        if not page or page.get("result") != "ok":
+            print(f"page {index} failed", file=sys.stderr)
+            continue
+        records.extend(page.get("devList", []))
+    return records
+
+
+async def cmd_dump(args):
+    client = await _connect(args)
+    if args.what == "devices":
+        records = await asyncio.to_thread(client.query_device_list) or []
+    else:
+        records = await _read_pages(client, args.what, args.concurrency)
+    _emit(records, args.format)
+
+
+def _build_command(line):
+    command = json.loads(line)
+    if "cmd" in command:
+        return command
+    device_type = get_device_type(command.pop("devType", None))
+    if device_type is None:
+        raise ValueError(f"unknown devType in {line.strip()}")
+    dev_no = command.pop("devNo")
+    dev_ch = command.pop("devCh")
+    return device_type.encode(dev_no, dev_ch, **command)
+
+
+async def cmd_bulk(args):
+    with open(args.file, encoding="utf-8") as f:
+        commands = [_build_command(line) for line in f if line.strip()]
+    client = await _connect(args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # 同一通道的命令按文件顺序逐条发送；不经 ctrl_dev，避免同通道的开关命令互相取代
+    channels = {}
+    for index, command in enumerate(commands):
+        key = (command.get("devNo"), command.get("devCh"))
+        channels.setdefault(key, []).append(index)
+    results = [None] * len(commands)
+
+    async def _run(indexes):
+        for index in indexes:
+            command = commands[index]
+            async with semaphore:
+                started = time.monotonic()
+                ok = await asyncio.to_thread(
+                    client.do_action, {**command, "action": Action.CtrlDev.value}
+                )
+            results[index] = {
+                "devNo": command.get("devNo"),
+                "devCh": command.get("devCh"),
+                "ok": bool(ok),
+                "ms": round((time.monotonic() - started) * 1000, 1),
+            }
+
+    started = time.monotonic()
+    await asyncio.gather(*(_run(indexes) for indexes in channels.values()))
+    _emit(results, "ndjson")
+    failed = sum(1 for result in results if not result["ok"])
+    print(
+        f"{len(results)} commands, {failed} failed, "
+        f"{time.monotonic() - started:.2f} s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+async def cmd_poll(args):
+    client = await _connect(args)
+    timings = []
+    channels = 0
+    for cycle in range(args.cycles):
+        started = time.monotonic()
+        states = await asyncio.to_thread(client.read_all_dev_state)
+        elapsed = time.monotonic() - started
+        timings.append(elapsed)
+        channels = len(states or [])
+        print(f"cycle {cycle}: {channels} channels, {elapsed * 1000:.1f} ms", file=sys.stderr)
+        if args.interval and cycle < args.cycles - 1:
+            await asyncio.sleep(args.interval)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    _emit(
+        [
+            {
+                "cycles": len(timings),
+                "channels": channels,
+                "min_ms": round(timings[0] * 1000, 1),
+                "avg_ms": round(statistics.mean(timings) * 1000, 1),
+                "p95_ms": round(p95 * 1000, 1),
+                "max_ms": round(timings[-1] * 1000, 1),
+                "limiter": client.limiter.diagnostics(),
+            }
+        ],
+        "json",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", required=True, help="gateway ip")
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default=os.environ.get("DNAKE_PASSWORD", "123456"))
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    # 子命令后也可指定并发数；未指定时沿用上面的值
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "-c", "--concurrency", type=int, default=argparse.SUPPRESS, help="max requests in flight"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dump = sub.add_parser("dump", parents=[common], help="dump devices, states or profiles")
+    dump.add_argument("--what", choices=["devices", "state", "profile"], default="state")
+    dump.add_argument("--format", choices=["json", "ndjson"], default="json")
+    dump.set_defaults(handler=cmd_dump)
+
+    bulk = sub.add_parser("bulk", parents=[common], help="send ctrlDev commands from a file")
+    bulk.add_argument("file")
+    bulk.set_defaults(handler=cmd_bulk)
+
+    poll = sub.add_parser("poll", parents=[common], help="time full state poll cycles")
+    poll.add_argument("--cycles", type=int, default=10)
+    poll.add_argument("--interval", type=float, default=0)
+    poll.set_defaults(handler=cmd_poll)
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(args.handler(args)) or 0)
+
+
+if __name__ == "__main__":
+    main()
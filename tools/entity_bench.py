@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Per-write cost of entity metadata for each Dnake entity class.
+
+Every state write makes Home Assistant read the entity's metadata (name,
+unique id, supported features, mode lists, temperature limits...) next to
+the state itself. This builds ``--channels`` entities of each kind and
+reports, per kind:
+
+- ``write_ns``: reading the attributes a state write reads, per entity,
+- ``device_info_ns``: reading ``device_info``, per entity,
+- ``construct_us``: creating one entity,
+- ``alloc_bytes``: memory allocated by one simulated write.
+
+Run it on two revisions to compare them. Needs Home Assistant importable
+(run it from an HA dev environment):
+
+    python tools/entity_bench.py --channels 2000 --rounds 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.dnake_home.air_fresh import DnakeAirFresh  # noqa: E402
+from custom_components.dnake_home.climate import DnakeClimate  # noqa: E402
+from custom_components.dnake_home.core.assistant import Assistant  # noqa: E402
+from custom_components.dnake_home.cover import DnakeCover  # noqa: E402
+from custom_components.dnake_home.floor_heating import DnakeFloorHeating  # noqa: E402
+from custom_components.dnake_home.hub import GatewayHub  # noqa: E402
+from custom_components.dnake_home.light import DnakeLight  # noqa: E402
+from custom_components.dnake_home.sensor import DnakeRequestLimitSensor  # noqa: E402
+
+_COMMON = ("name", "unique_id", "should_poll", "supported_features", "available")
+
+# 状态写入时 HA 读取的属性（状态值与能力属性）
+KINDS = {
+    "light": (
+        DnakeLight,
+        _COMMON + ("is_on", "color_mode", "supported_color_modes"),
+    ),
+    "cover": (
+        DnakeCover,
+        _COMMON + ("is_closed", "is_opening", "is_closing", "current_cover_position"),
+    ),
+    "climate": (
+        DnakeClimate,
+        _COMMON
+        + (
+            "hvac_mode",
+            "hvac_modes",
+            "fan_mode",
+            "fan_modes",
+            "target_temperature",
+            "current_temperature",
+            "min_temp",
+            "max_temp",
+            "target_temperature_step",
+            "temperature_unit",
+        ),
+    ),
+    "floor_heating": (
+        DnakeFloorHeating,
+        _COMMON
+        + (
+            "hvac_mode",
+            "hvac_modes",
+            "target_temperature",
+            "current_temperature",
+            "min_temp",
+            "max_temp",
+            "target_temperature_step",
+            "temperature_unit",
+        ),
+    ),
+    "air_fresh": (
+        DnakeAirFresh,
+        _COMMON + ("is_on", "percentage", "speed_count"),
+    ),
+    # 网关诊断传感器不对应通道，每个网关一个
+    "sensor": (
+        lambda hub, device: DnakeRequestLimitSensor(hub),
+        _COMMON + ("native_value", "state_class", "entity_category"),
+    ),
+}
+
+
+def _device(kind, index):
+    return {
+        "devName": f"{kind} {index}",
+        "gatewayDeviceInfo": {"devNo": index // 4 + 1, "devCh": index % 4 + 1},
+    }
+
+
+def _write(entity, attributes):
+    return [getattr(entity, attribute) for attribute in attributes]
+
+
+def bench(kind, channels, rounds):
+    create, attributes = KINDS[kind]
+    started = time.perf_counter()
+    hub = GatewayHub(None, "bench", "127.0.0.1", None, Assistant())
+    entities = [create(hub, _device(kind, index)) for index in range(channels)]
+    construct = (time.perf_counter() - started) / channels
+
+    best_write = best_info = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for entity in entities:
+            _write(entity, attributes)
+        elapsed = time.perf_counter() - started
+        best_write = elapsed if best_write is None else min(best_write, elapsed)
+        started = time.perf_counter()
+        for entity in entities:
+            entity.device_info
+        elapsed = time.perf_counter() - started
+        best_info = elapsed if best_info is None else min(best_info, elapsed)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    # 保留每次读取的结果，属性访问新建的对象（集合、列表、字符串）都计入
+    results = [_write(entity, attributes) for entity in entities]
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del results
+
+    return {
+        "write_ns": round(best_write / channels * 1e9),
+        "device_info_ns": round(best_info / channels * 1e9),
+        "construct_us": round(construct * 1e6, 1),
+        "alloc_bytes": round(allocated / channels),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--channels", type=int, default=2000, help="entities per kind")
+    parser.add_argument("--rounds", type=int, default=20, help="best of N rounds")
+    parser.add_argument("--kinds", nargs="+", choices=list(KINDS), default=list(KINDS))
+    args = parser.parse_args()
+    report = {kind: bench(kind, args.channels, args.rounds) for kind in args.kinds}
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Memory footprint of the integration for large synthetic installations.
+
+Builds the entities and gateway model for installations of the given sizes
+(channels spread over lights, covers, air conditioners, air fresh units and
+floor heating), then runs poll cycles through ``read_all_dev_state`` and
+``DnakePoller.async_dispatch`` (model merge, change events and the sliced
+``update_*_state`` dispatch, as a running poller does) against a synthetic
+gateway, and reports with tracemalloc:
+
+- steady state memory per entity once every entity has seen a full cycle,
+- allocation churn per cycle (peak traced memory above the cycle start),
+- growth over many cycles, flagged as a leak above a per-cycle threshold,
+  with the source lines that grew most.
+
+Needs Home Assistant importable (run it from an HA dev environment):
+
+    python tools/memprofile.py --channels 1000 5000 10000 --cycles 200
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.dnake_home.air_fresh import (  # noqa: E402
+    DnakeAirFresh,
+    load_air_fresh_devices,
+)
+from custom_components.dnake_home.climate import DnakeClimate, load_climates  # noqa: E402
+from custom_components.dnake_home.core.assistant import Assistant  # noqa: E402
+from custom_components.dnake_home.core.model import GatewayModel  # noqa: E402
+from custom_components.dnake_home.core.registry import (  # noqa: E402
+    DEVICE_TYPES,
+    classify_devices,
+)
+from custom_components.dnake_home.cover import DnakeCover, load_covers  # noqa: E402
+from custom_components.dnake_home.floor_heating import (  # noqa: E402
+    DnakeFloorHeating,
+    load_floor_heatings,
+)
+from custom_components.dnake_home.hub import GatewayHub  # noqa: E402
+from custom_components.dnake_home.light import DnakeLight, load_lights  # noqa: E402
+from custom_components.dnake_home.poller import DnakePoller  # noqa: E402
+
+# 各类型通道占比，接近常见住宅配置
+MIX = {256: 0.5, 514: 0.2, 1536: 0.15, 1792: 0.05, 2048: 0.1}
+
+_LOADERS = {
+    "light": load_lights,
+    "cover": load_covers,
+    "climate": load_climates,
+    "floor_heating": load_floor_heatings,
+    "air_fresh": load_air_fresh_devices,
+}
+
+_writes = 0
+
+
+def _count_write(self):
+    global _writes
+    _writes += 1
+
+
+# 实体未加入 hass，只统计状态写入次数
+for _cls in (DnakeLight, DnakeCover, DnakeClimate, DnakeFloorHeating, DnakeAirFresh):
+    _cls.async_write_ha_state = _count_write
+
+
+def _random_reports(device_type, rng):
+    reports = {}
+    for field in device_type.fields.values():
+        if field.enum is not None:
+            reports[field.raw] = rng.choice(list(field.enum.to_raw.values()))
+        elif field.scale is not None:
+            reports[field.raw] = rng.randrange(1600, 3200, 10)
+        elif field.raw == "level":
+            reports[field.raw] = rng.randrange(0, 255)
+        else:
+            reports[field.raw] = rng.randrange(0, 2)
+    return reports
+
+
+class SyntheticGateway(Assistant):
+    """Answers full-scope readDev with a pre-serialized page, like the gateway"""
+
+    def __init__(self, channels, seed=0):
+        super().__init__()
+        self.rng = random.Random(seed)
+        self.device_list = []
+        self.records = []
+        dev_types = list(MIX)
+        weights = [MIX[dev_type] for dev_type in dev_types]
+        for index in range(channels):
+            dev_type = self.rng.choices(dev_types, weights)[0]
+            dev_no, dev_ch = index // 4 + 1, index % 4 + 1
+            self.device_list.append(
+                {
+                    "devName": f"{DEVICE_TYPES[dev_type].kind} {index}",
+                    "devType": dev_type,
+                    "gatewayDeviceInfo": {"devNo": dev_no, "devCh": dev_ch},
+                }
+            )
+            self.records.append(
+                {
+                    "devNo": dev_no,
+                    "devCh": dev_ch,
+                    "devType": dev_type,
+                    "reports": _random_reports(DEVICE_TYPES[dev_type], self.rng),
+                }
+            )
+        self._payload = None
+        self.advance(0)
+
+    def advance(self, change):
+        """Change a fraction of channels and serialize the next response"""
+        for record in self.rng.sample(self.records, int(len(self.records) * change)):
+            device_type = DEVICE_TYPES[record["devType"]]
+            record["reports"] = _random_reports(device_type, self.rng)
+        self._payload = json.dumps(
+            {"result": "ok", "devList": self.records, "pageNo": 1, "totalPage": 1}
+        )
+
+    def post(self, data: dict, deadline=None):
+        # 与 requests 的 resp.json() 一样，每次都解析出新的对象
+        return json.loads(self._payload)
+
+
+def _traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def _async_poll_cycle(gateway, poller):
+    await poller.async_dispatch(gateway.read_all_dev_state())
+
+
+async def async_profile(hass, channels, args):
+    global _writes
+    gateway = SyntheticGateway(channels, args.seed)
+
+    baseline = _traced()
+    model = GatewayModel(("synthetic",), {}, gateway.device_list)
+    hub = GatewayHub(hass, "synthetic", "127.0.0.1", model, gateway)
+    groups = classify_devices(gateway.device_list)
+    for kind, devices in groups.items():
+        hub.entries[kind] = _LOADERS[kind](hub, devices)
+        # 平台加入实体时才设置 hass，轮询器跳过尚未加入的实体
+        for entity in hub.entries[kind]:
+            entity.hass = hass
+    poller = DnakePoller(hass, hub, args.scan_interval)
+    entities = sum(len(entries) for entries in hub.entries.values())
+    built = _traced()
+
+    for _ in range(args.warmup):
+        gateway.advance(args.change)
+        await _async_poll_cycle(gateway, poller)
+    steady = _traced()
+
+    churn = []
+    samples = []
+    _writes = 0
+    leak_start = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    for cycle in range(args.cycles):
+        gateway.advance(args.change)
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await _async_poll_cycle(gateway, poller)
+        churn.append(tracemalloc.get_traced_memory()[1] - before)
+        if cycle % args.sample_every == 0:
+            samples.append((cycle, _traced()))
+    elapsed = time.perf_counter() - started
+    leak_end = tracemalloc.take_snapshot()
+    end = _traced()
+
+    # 按周期内存占用做线性回归，斜率即每周期增长
+    slope = 0.0
+    if len(samples) > 1:
+        mean_x = sum(x for x, _ in samples) / len(samples)
+        mean_y = sum(y for _, y in samples) / len(samples)
+        var = sum((x - mean_x) ** 2 for x, _ in samples)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var
+
+    churn.sort()
+    growth = [
+        stat
+        for stat in leak_end.compare_to(leak_start, "lineno")
+        if stat.size_diff > 0
+    ][: args.top]
+    result = {
+        "channels": channels,
+        "entities": entities,
+        "entities_kib": round((built - baseline) / 1024, 1),
+        "steady_kib": round((steady - baseline) / 1024, 1),
+        "bytes_per_entity": round((steady - baseline) / max(1, entities)),
+        "churn_p50_kib": round(churn[len(churn) // 2] / 1024, 1),
+        "churn_max_kib": round(churn[-1] / 1024, 1),
+        "cycle_ms": round(elapsed / args.cycles * 1000, 2),
+        "writes_per_cycle": round(_writes / args.cycles, 1),
+        "growth_kib": round((end - steady) / 1024, 1),
+        "growth_bytes_per_cycle": round(slope, 1),
+        "leak": slope > args.leak_threshold,
+        "top_growth": [
+            f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} "
+            f"+{stat.size_diff} B ({stat.count_diff:+d} blocks)"
+            for stat in growth
+        ],
+    }
+    return result
+
+
+async def _async_profile_all(args):
+    hass = HomeAssistant(tempfile.gettempdir())
+    return [await async_profile(hass, channels, args) for channels in args.channels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--channels", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--change", type=float, default=0.05, help="fraction of channels changed per cycle"
+    )
+    parser.add_argument("--sample-every", type=int, default=10)
+    parser.add_argument(
+        "--leak-threshold",
+        type=float,
+        default=64,
+        help="growth in bytes per cycle reported as a leak",
+    )
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scan-interval", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    results = asyncio.run(_async_profile_all(args))
+    tracemalloc.stop()
+
+    if args.json:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for result in results:
+            print(
+                f"{result['channels']:>6} channels: "
+                f"{result['bytes_per_entity']} B/entity, "
+                f"steady {result['steady_kib']} KiB, "
+                f"churn p50 {result['churn_p50_kib']} KiB max {result['churn_max_kib']} KiB, "
+                f"{result['cycle_ms']} ms/cycle, "
+                f"{result['writes_per_cycle']} writes/cycle, "
+                f"growth {result['growth_bytes_per_cycle']} B/cycle"
+                + (" LEAK" if result["leak"] else "")
+            )
+            for line in result["top_growth"] if result["leak"] else ():
+                print(f"        {line}")
+    return 1 if any(result["leak"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
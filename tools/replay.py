@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded gateway session through the integration core.
+
+Record traffic on a live install by enabling "Record Gateway Traffic" in the
+integration options, copy ``dnake_home_traffic.ndjson.gz`` from the HA config
+directory, then:
+
+    python tools/replay.py dnake_home_traffic.ndjson.gz --speed 20 --cycles 100
+
+Each cycle performs the same full-state read the poller issues, decodes it
+with the device type registry, applies the indoor temperature filter and
+counts the channels whose decoded state changed (i.e. the state writes HA
+would see). Recorded gateway latency is reproduced divided by ``--speed``.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "custom_components", "dnake_home"),
+)
+
+from core.filters import MeasurementFilter, temperature_filter_settings  # noqa: E402
+from core.recorder import ReplayAssistant  # noqa: E402
+from core.registry import DEVICE_TYPES, classify_devices, index_states  # noqa: E402
+
+
+def run(args):
+    replay = ReplayAssistant.from_file(args.recording, args.speed)
+    iot_info = replay.query_iot_info()
+    if iot_info:
+        replay.bind_iot_info(iot_info["iot_device_name"], iot_info["gw_iot_name"])
+    device_list = replay.query_device_list() or []
+    groups = classify_devices(device_list)
+    print(
+        "devices: "
+        + ", ".join(f"{kind}={len(devices)}" for kind, devices in groups.items())
+    )
+
+    last = {}
+    filters = {}
+    writes = 0
+    started = time.monotonic()
+    for cycle in range(args.cycles):
+        cycle_started = time.monotonic()
+        states = index_states(replay.read_all_dev_state())
+        cycle_writes = 0
+        for key, state in states.items():
+            device_type = DEVICE_TYPES.get(state.get("devType"))
+            if device_type is None:
+                continue
+            values = device_type.decode(state.get("reports", {}))
+            if "temp_indoor" in values:
+                temp_filter = filters.setdefault(
+                    key, MeasurementFilter(temperature_filter_settings)
+                )
+                # 以录制时间而非加速后的真实时间计算最小更新间隔
+                values["temp_indoor"] = temp_filter.update(
+                    values["temp_indoor"], now=cycle * args.scan_interval
+                )
+            if last.get(key) != values:
+                last[key] = values
+                cycle_writes += 1
+        writes += cycle_writes
+        if args.verbose:
+            print(
+                f"cycle {cycle}: {len(states)} channels, {cycle_writes} writes, "
+                f"{(time.monotonic() - cycle_started) * 1000:.1f} ms"
+            )
+        if args.scan_interval and args.speed:
+            time.sleep(args.scan_interval / args.speed)
+
+    elapsed = time.monotonic() - started
+    print(f"cycles: {args.cycles} in {elapsed:.2f} s")
+    print(f"requests: {replay.requests} ({replay.requests / elapsed:.1f}/s), misses: {replay.misses}")
+    print(f"state writes: {writes} ({writes / max(1, args.cycles):.1f}/cycle)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recording", help="dnake_home_traffic.ndjson.gz")
+    parser.add_argument("--speed", type=float, default=1.0, help="time acceleration, 0 = no delays")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--scan-interval", type=float, default=10, help="seconds between polls at 1x")
+    parser.add_argument("--deadband", type=float, default=temperature_filter_settings.deadband)
+    parser.add_argument("--min-interval", type=float, default=temperature_filter_settings.min_interval)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    temperature_filter_settings.deadband = args.deadband
+    temperature_filter_settings.min_interval = args.min_interval
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Soak and chaos test of the integration core against a stand-in gateway.
+
+Starts a local HTTP gateway that serves iot.info, device.info and the
+readDev/ctrlDev API for a synthetic installation, with covers that really
+take time to travel. While it injects latency spikes, dropped connections,
+5xx responses and periodic full outages, the harness drives the real
+``Assistant`` transport the way the integration does:
+
+- full scans every ``--scan-interval`` seconds, each with a deadline,
+- cover motions with level reads while moving,
+- randomized light / cover / air conditioner commands.
+
+A command counts as confirmed once a full scan shows the commanded value.
+The report has p50/p95/p99 command-to-confirmed latency per kind, request
+volume, fault counts and the time to the first good scan after each outage:
+
+    python tools/soak.py --duration 600 --channels 400 --drop-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "custom_components", "dnake_home"),
+)
+
+from core.assistant import Assistant  # noqa: E402
+from core.command_queue import CommandQueue  # noqa: E402
+from core.deadline import Deadline  # noqa: E402
+from core.registry import COVER, DEVICE_TYPES  # noqa: E402
+from core.travel import MAX_LEVEL  # noqa: E402
+
+# 各类型通道占比
+MIX = {256: 0.5, 514: 0.2, 1536: 0.15, 1792: 0.05, 2048: 0.1}
+
+
+class StandInGateway:
+    """State and fault model of the stand-in gateway"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.devices = []
+        self.channels = {}
+        self.motions = {}
+        self.requests = {}
+        self.faults = {"spike": 0, "drop": 0, "5xx": 0, "outage": 0}
+        dev_types = list(MIX)
+        weights = [MIX[dev_type] for dev_type in dev_types]
+        for index in range(args.channels):
+            dev_type = self.rng.choices(dev_types, weights)[0]
+            key = (index // 4 + 1, index % 4 + 1)
+            self.devices.append(
+                {
+                    "devName": f"{DEVICE_TYPES[dev_type].kind} {index}",
+                    "devType": dev_type,
+                    "gatewayDeviceInfo": {"devNo": key[0], "devCh": key[1]},
+                }
+            )
+            reports = {
+                field.raw: field.default if field.default is not None else 0
+                for field in DEVICE_TYPES[dev_type].fields.values()
+            }
+            self.channels[key] = (dev_type, reports)
+
+    def in_outage(self, now=None):
+        every, length = self.args.outage_every, self.args.outage_length
+        if not every:
+            return False
+        elapsed = (time.monotonic() if now is None else now) - self.started
+        return elapsed % every >= every - length
+
+    def outages(self, until):
+        """(start, end) of the outages that ended before ``until``"""
+        every, length = self.args.outage_every, self.args.outage_length
+        if not every:
+            return []
+        result = []
+        end = self.started + every
+        while end <= until:
+            result.append((end - length, end))
+            end += every
+        return result
+
+    def fault(self):
+        """Fault to inject for one request: None, "drop" or "5xx" (after spikes)"""
+        args = self.args
+        with self.lock:
+            roll = self.rng.random()
+            spike = self.rng.random() < args.spike_rate
+        if spike:
+            with self.lock:
+                self.faults["spike"] += 1
+            time.sleep(args.spike_ms / 1000)
+        else:
+            time.sleep(self.rng.uniform(0.5, 1.5) * args.latency_ms / 1000)
+        if self.in_outage():
+            kind = "outage"
+        elif roll < args.drop_rate:
+            kind = "drop"
+        elif roll < args.drop_rate + args.error_rate:
+            kind = "5xx"
+        else:
+            return None
+        with self.lock:
+            self.faults[kind] += 1
+        return "5xx" if kind == "5xx" else "drop"
+
+    def _level(self, key, now):
+        motion = self.motions.get(key)
+        reports = self.channels[key][1]
+        if motion is None:
+            return reports["level"]
+        start_level, target, started = motion
+        travel = abs(target - start_level) / MAX_LEVEL * self.args.cover_travel
+        if travel <= 0 or now - started >= travel:
+            reports["level"] = target
+            del self.motions[key]
+            return target
+        progress = (now - started) / travel
+        return round(start_level + (target - start_level) * progress)
+
+    def _record(self, key, now):
+        dev_type, reports = self.channels[key]
+        if dev_type == COVER.dev_type:
+            reports = {**reports, "level": self._level(key, now)}
+        return {"devNo": key[0], "devCh": key[1], "devType": dev_type, "reports": dict(reports)}
+
+    def handle(self, data):
+        now = time.monotonic()
+        action = data.get("action")
+        with self.lock:
+            self.requests[action] = self.requests.get(action, 0) + 1
+            if action == "readDev":
+                if data.get("scope") == "all":
+                    dev_type = data.get("devType")
+                    records = [
+                        self._record(key, now)
+                        for key, (channel_type, _) in self.channels.items()
+                        if dev_type is None or channel_type == dev_type
+                    ]
+                    return {"result": "ok", "devList": records, "pageNo": 1, "totalPage": 1}
+                key = (data.get("devNo"), data.get("devCh"))
+                if key not in self.channels:
+                    return {"result": "fail"}
+                record = self._record(key, now)
+                return {"result": "ok", **record, **record["reports"]}
+            if action == "ctrlDev":
+                key = (data.get("devNo"), data.get("devCh"))
+                if key not in self.channels:
+                    return {"result": "fail"}
+                dev_type, reports = self.channels[key]
+                cmd = data.get("cmd")
+                if cmd in ("On", "Off"):
+                    reports["state"] = 1 if cmd == "On" else 0
+                elif cmd == "level":
+                    current = self._level(key, now)
+                    self.motions[key] = (current, data.get("level"), now)
+                elif cmd == "stop":
+                    reports["level"] = self._level(key, now)
+                    self.motions.pop(key, None)
+                else:
+                    for field in DEVICE_TYPES[dev_type].fields.values():
+                        if field.raw in data:
+                            reports[field.raw] = data[field.raw]
+                return {"result": "ok"}
+        return {"result": "fail"}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端超时断开后写回复失败，属于预期情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _make_handler(gateway: StandInGateway):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, payload):
+            fault = gateway.fault()
+            if fault == "drop":
+                # 不回复直接断开，客户端得到连接错误
+                self.close_connection = True
+                return
+            if fault == "5xx":
+                body = b"busy"
+                self.send_response(503)
+            else:
+                body = json.dumps(payload()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/smart/iot.info":
+                self._reply(lambda: {"devIotName": "soak-client", "gwIotName": "soak-gateway"})
+            elif self.path == "/smart/extra/device.info":
+                self._reply(lambda: gateway.devices)
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            self._reply(lambda: gateway.handle(request.get("data", {})))
+
+    return Handler
+
+
+class Tracker:
+    """Command-to-confirmed latency, confirmed by full scans"""
+
+    def __init__(self):
+        self.pending = {}
+        self.latencies = {}
+        self.issued = {}
+        self.failed = 0
+        self.superseded = 0
+
+    def issue(self, kind, key, attr, expected, issued_at):
+        self.issued[kind] = self.issued.get(kind, 0) + 1
+        if (key, attr) in self.pending:
+            self.superseded += 1
+        self.pending[(key, attr)] = (kind, expected, issued_at)
+
+    def observe(self, states, now):
+        for record in states:
+            device_type = DEVICE_TYPES.get(record.get("devType"))
+            if device_type is None:
+                continue
+            key = (record.get("devNo"), record.get("devCh"))
+            values = None
+            for attr in device_type.fields:
+                pending = self.pending.get((key, attr))
+                if pending is None:
+                    continue
+                values = values or device_type.decode(record.get("reports", {}))
+                kind, expected, issued_at = pending
+                if values[attr] == expected:
+                    del self.pending[(key, attr)]
+                    self.latencies.setdefault(kind, []).append(now - issued_at)
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def _at(q):
+        return round(values[min(len(values) - 1, int(len(values) * q))] * 1000)
+
+    return {
+        "count": len(values),
+        "p50_ms": _at(0.5),
+        "p95_ms": _at(0.95),
+        "p99_ms": _at(0.99),
+        "max_ms": round(values[-1] * 1000),
+    }
+
+
+async def _scan_loop(client, tracker, scans, args, stop):
+    while not stop.is_set():
+        started = time.monotonic()
+        states = await asyncio.to_thread(
+            client.read_all_dev_state, 0, None, Deadline(args.scan_interval)
+        )
+        now = time.monotonic()
+        if states:
+            scans.append(now)
+            tracker.observe(states, now)
+        await asyncio.sleep(max(0.0, args.scan_interval - (now - started)))
+
+
+async def _cover_watch(client, dev_no, dev_ch, target, args):
+    """Read the level while the cover moves, like the cover entity does"""
+    ends = time.monotonic() + args.cover_travel + 5
+    while time.monotonic() < ends:
+        await asyncio.sleep(args.cover_poll_ms / 1000)
+        state = await asyncio.to_thread(
+            client.read_dev_state, dev_no, dev_ch, None, None, Deadline(client.timeout * 2)
+        )
+        if state and state.get("result") == "ok" and state.get("level") == target:
+            return
+
+
+async def _command(client, by_type, tracker, rng, args, watchers):
+    dev_type = rng.choice([t for t in (256, 514, 1536) if by_type.get(t)])
+    key = rng.choice(by_type[dev_type])
+    issued_at = time.monotonic()
+    if dev_type == 256:
+        on = rng.random() < 0.5
+        ok = await asyncio.to_thread(client.turn_to, *key, on)
+        kind, attr, expected = "light", "state", 1 if on else 0
+    elif dev_type == 514:
+        level = rng.randrange(0, MAX_LEVEL + 1)
+        ok = await asyncio.to_thread(client.set_level, *key, level)
+        kind, attr, expected = "cover", "level", level
+        if ok:
+            watcher = asyncio.create_task(_cover_watch(client, *key, level, args))
+            watchers.add(watcher)
+            watcher.add_done_callback(watchers.discard)
+    else:
+        temp = rng.randrange(16, 31)
+        ok = await asyncio.to_thread(client.set_air_condition_temperature, *key, temp)
+        kind, attr, expected = "climate", "temp", float(temp)
+    if ok:
+        tracker.issue(kind, key, attr, expected, issued_at)
+    else:
+        tracker.failed += 1
+
+
+async def _command_loop(client, gateway, tracker, args, stop):
+    """Random commands arriving independently of each other, like users"""
+    rng = random.Random(args.seed + 1)
+    by_type = {}
+    for device in gateway.devices:
+        info = device["gatewayDeviceInfo"]
+        by_type.setdefault(device["devType"], []).append((info["devNo"], info["devCh"]))
+    commands = set()
+    watchers = set()
+    while not stop.is_set():
+        await asyncio.sleep(rng.expovariate(args.command_rate))
+        command = asyncio.create_task(
+            _command(client, by_type, tracker, rng, args, watchers)
+        )
+        commands.add(command)
+        command.add_done_callback(commands.discard)
+    if commands:
+        await asyncio.wait(commands)
+    for watcher in list(watchers):
+        watcher.cancel()
+
+
+async def run(args):
+    gateway = StandInGateway(args)
+    server = _Server(("127.0.0.1", args.port), _make_handler(gateway))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+
+    client = Assistant()
+    client.bind_auth_info(host, "admin", "123456")
+    client.configure(timeout=args.timeout, max_inflight=args.max_inflight)
+    if args.queue:
+        client.set_command_queue(CommandQueue())
+    iot_info = None
+    while iot_info is None:
+        iot_info = await asyncio.to_thread(client.query_iot_info)
+    client.bind_iot_info(iot_info["iot_device_name"], iot_info["gw_iot_name"])
+
+    tracker = Tracker()
+    scans = []
+    stop = asyncio.Event()
+    started = time.monotonic()
+    tasks = [
+        asyncio.create_task(_scan_loop(client, tracker, scans, args, stop)),
+        asyncio.create_task(_command_loop(client, gateway, tracker, args, stop)),
+    ]
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(min(10, args.duration))
+        print(
+            f"{time.monotonic() - started:6.0f} s: {sum(gateway.requests.values())} requests, "
+            f"{len(tracker.pending)} pending, limiter {client.limiter.diagnostics()}",
+            file=sys.stderr,
+        )
+    stop.set()
+    await asyncio.gather(*tasks)
+    ended = time.monotonic()
+    server.shutdown()
+
+    recoveries = []
+    for _, outage_end in gateway.outages(ended):
+        first = next((scan for scan in scans if scan >= outage_end), None)
+        if first is not None:
+            recoveries.append(first - outage_end)
+    elapsed = ended - started
+    total_requests = sum(gateway.requests.values())
+    all_latencies = [value for values in tracker.latencies.values() for value in values]
+    return {
+        "duration_s": round(elapsed),
+        "channels": args.channels,
+        "latency": {
+            "all": _percentiles(all_latencies),
+            **{kind: _percentiles(values) for kind, values in tracker.latencies.items()},
+        },
+        "commands": {
+            "issued": tracker.issued,
+            "failed": tracker.failed,
+            "superseded": tracker.superseded,
+            "unconfirmed": len(tracker.pending),
+        },
+        "requests": {
+            "total": total_requests,
+            "per_second": round(total_requests / elapsed, 2),
+            "by_action": gateway.requests,
+            "scans": len(scans),
+        },
+        "faults": gateway.faults,
+        "recovery": {
+            "outages": len(recoveries),
+            "mean_s": round(statistics.mean(recoveries), 2) if recoveries else None,
+            "max_s": round(max(recoveries), 2) if recoveries else None,
+        },
+        "limiter": client.limiter.diagnostics(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=600)
+    parser.add_argument("--channels", type=int, default=400)
+    parser.add_argument("--port", type=int, default=0, help="stand-in gateway port (0: any)")
+    parser.add_argument("--scan-interval", type=float, default=10)
+    parser.add_argument("--command-rate", type=float, default=0.5, help="commands per second")
+    parser.add_argument("--cover-travel", type=float, default=20, help="full travel seconds")
+    parser.add_argument("--cover-poll-ms", type=float, default=500)
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument("--max-inflight", type=int, default=4)
+    parser.add_argument("--queue", action="store_true", help="enable the offline command queue")
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--spike-rate", type=float, default=0.01)
+    parser.add_argument("--spike-ms", type=float, default=3000)
+    parser.add_argument("--drop-rate", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--outage-every", type=float, default=120, help="seconds, 0 to disable")
+    parser.add_argument("--outage-length", type=float, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()